@@ -0,0 +1,112 @@
+# Run many topics through finalize.graph from a JSONL manifest.
+#
+# Each manifest line is a JSON object:
+#   {"topic": "the latest iphone 17", "max_customers": 3, "id": "iphone-17", "feedback": ["make one a student"]}
+# Only "topic" is required. "feedback" entries are applied in order at the human_feedback
+# interrupt; once they run out the customers are approved. "models" overrides the model
+# routes for the topic (see models). Any other key is passed to the graph input
+# (e.g. "context_token_budget", "passage_top_k").
+#
+#   python batch.py topics.jsonl --out reports --workers 4
+#
+# Each topic writes <out>/<id>/report.md and <out>/<id>/run.json. Topics that already have a
+# run.json are skipped, so an interrupted batch resumes where it stopped. With CHECKPOINT_DB set,
+# topics that were interrupted mid-run continue from their last checkpoint.
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import traceback
+
+import finalize
+
+# Nodes that only run once the customers are approved. A topic interrupted before approval
+# (e.g. while its customers were regenerated) starts the approval flow again
+AFTER_APPROVAL = {"prefetch_background", "conduct_interview", "reuse_section", "report_group", "write_report", "finalize_report"}
+
+def topic_id(index:int, entry:dict) -> str:
+    if entry.get("id"):
+        return str(entry["id"])
+    slug = re.sub(r"[^a-z0-9]+", "-", entry["topic"].lower()).strip("-")[:40]
+    return f"{index:04d}-{slug}"
+
+def load_manifest(path:str) -> list:
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [(topic_id(i, entry), entry) for i, entry in enumerate(entries)]
+
+async def run_topic(run_id:str, entry:dict, out_dir:str, deadline:float=None):
+    graph = finalize.graph
+    thread = {"configurable":{"thread_id":f"batch-{run_id}"}}
+    if entry.get("models"):
+        thread["configurable"]["models"] = entry["models"]
+    feedback = list(entry.get("feedback", []))
+    graph_input = {key:value for key, value in entry.items() if key not in ("id", "feedback", "models")}
+    graph_input.setdefault("max_customers", 3)
+
+    started = time.time()
+    state = await graph.aget_state(thread)
+    if AFTER_APPROVAL & set(state.next):
+        # Interrupted after approval in an earlier batch: continue from the checkpoint
+        customers_done = started
+    else:
+        await graph.ainvoke(graph_input, thread)
+        # Scripted feedback regenerates the customers; an empty queue approves them
+        while feedback:
+            await graph.aupdate_state(thread, {"human_analyst_feedback":feedback.pop(0)}, as_node="human_feedback")
+            await graph.ainvoke(None, thread)
+        customers_done = time.time()
+        await graph.aupdate_state(thread, {"human_analyst_feedback":None}, as_node="human_feedback")
+    run_thread = {"configurable":{**thread["configurable"], "deadline":time.time() + deadline}} if deadline else thread
+    final_state = await graph.ainvoke(None, run_thread)
+    finished = time.time()
+
+    topic_dir = os.path.join(out_dir, run_id)
+    os.makedirs(topic_dir, exist_ok=True)
+    with open(os.path.join(topic_dir, "report.md"), "w") as f:
+        f.write(final_state.get("final_report") or "")
+    run = {
+        "id":run_id,
+        "topic":entry["topic"],
+        "customers":[customer.name for customer in final_state.get("customers", [])],
+        "dropped":final_state.get("dropped", []),
+        "started_at":started,
+        "create_customers_seconds":round(customers_done - started, 3),
+        "interviews_and_report_seconds":round(finished - customers_done, 3),
+        "total_seconds":round(finished - started, 3),
+    }
+    # run.json is written last: its presence marks the topic as completed
+    with open(os.path.join(topic_dir, "run.json"), "w") as f:
+        json.dump(run, f, indent=2)
+    return run
+
+async def run_batch(manifest:str, out_dir:str, workers:int, deadline:float=None):
+    os.makedirs(out_dir, exist_ok=True)
+    pending = [
+        (run_id, entry) for run_id, entry in load_manifest(manifest)
+        if not os.path.exists(os.path.join(out_dir, run_id, "run.json"))
+    ]
+    print(f"{len(pending)} topics to run")
+    limit = asyncio.Semaphore(workers)
+
+    async def worker(run_id, entry):
+        async with limit:
+            try:
+                run = await run_topic(run_id, entry, out_dir, deadline)
+                print(f"done {run_id} in {run['total_seconds']}s")
+            except Exception:
+                print(f"failed {run_id}")
+                traceback.print_exc()
+
+    await asyncio.gather(*(worker(run_id, entry) for run_id, entry in pending))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate reviews for every topic in a JSONL manifest.")
+    parser.add_argument("manifest")
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--workers", type=int, default=4, help="topics run concurrently")
+    parser.add_argument("--deadline", type=float, help="seconds each topic's interviews may take")
+    args = parser.parse_args()
+    asyncio.run(run_batch(args.manifest, args.out, args.workers, args.deadline))
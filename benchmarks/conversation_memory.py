@@ -0,0 +1,71 @@
+# Measure prompt tokens per interview turn with and without conversation compression.
+#
+#   python -m benchmarks.conversation_memory --turns 2 4 6 8 10 --threshold 1500 --out memory.json
+#
+# Runs a single interview with a fake chat model for every max_num_turns and memory
+# strategy, and reports the prompt tokens of the text LLM calls in each turn, including
+# the summarization calls the "summary" strategy adds.
+import argparse
+import asyncio
+import json
+import os
+from collections import Counter, defaultdict
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+from langchain_core.messages import HumanMessage
+
+import conversation_memory
+import finalize
+import instrumentation
+import retrieval_cache
+from benchmarks.fakes import FakeChatModel, FakeTavily, FakeWikipediaLoader, structured_outputs
+from shared import Customer
+
+async def run_once(max_num_turns:int, strategy:str, threshold:int, keep_exchanges:int, output_tokens:int) -> dict:
+    finalize.llm = FakeChatModel(output_tokens=output_tokens, structured_output=structured_outputs(1), calls=Counter(), callbacks=[instrumentation.usage_handler])
+    finalize.tavily_search = FakeTavily()
+    finalize.WikipediaLoader = FakeWikipediaLoader
+    finalize.search_cache = retrieval_cache.RetrievalCache(":memory:")
+    instrumentation.reset()
+
+    graph = finalize.interview_builder.compile()
+    customer = Customer(name="Customer 0", occupation="Tester", age=30, description="Compares phones for a living")
+    await graph.ainvoke({
+        "customer":customer,
+        "messages":[HumanMessage(content="So you said you were writing an article on the latest phone?")],
+        "max_num_turns":max_num_turns,
+        "memory_strategy":strategy,
+        "memory_token_threshold":threshold,
+        "memory_keep_exchanges":keep_exchanges,
+    }, {"recursion_limit":10 * max_num_turns + 10})
+
+    per_turn = defaultdict(int)
+    for record in instrumentation.records:
+        if record["turn"] is not None:
+            per_turn[record["turn"] + 1] += record["prompt_tokens"]
+    turns = [per_turn[turn] for turn in range(1, max_num_turns + 1)]
+    return {"max_num_turns":max_num_turns, "strategy":strategy, "prompt_tokens_per_turn":turns, "prompt_tokens":sum(turns)}
+
+async def main(args):
+    runs = []
+    for max_num_turns in args.turns:
+        full = await run_once(max_num_turns, "full", args.threshold, args.keep_exchanges, args.output_tokens)
+        summary = await run_once(max_num_turns, "summary", args.threshold, args.keep_exchanges, args.output_tokens)
+        saved = [a - b for a, b in zip(full["prompt_tokens_per_turn"], summary["prompt_tokens_per_turn"])]
+        print(f"turns={max_num_turns:<3} full={full['prompt_tokens']:<7} summary={summary['prompt_tokens']:<7} saved per turn={saved}")
+        runs += [full, summary]
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"threshold":args.threshold, "keep_exchanges":args.keep_exchanges, "output_tokens":args.output_tokens, "runs":runs}, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare interview prompt tokens per turn for each memory strategy.")
+    parser.add_argument("--turns", type=int, nargs="+", default=list(range(2, 11)))
+    parser.add_argument("--threshold", type=int, default=conversation_memory.DEFAULT_TOKEN_THRESHOLD, help="memory_token_threshold")
+    parser.add_argument("--keep-exchanges", type=int, default=conversation_memory.DEFAULT_KEEP_EXCHANGES)
+    parser.add_argument("--output-tokens", type=int, default=200, help="words returned by each fake completion")
+    parser.add_argument("--out")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+# Local stand-in for the OpenAI chat completions endpoint (and Tavily's /search) that throttles like the real ones.
+#
+#   python -m benchmarks.fake_openai_server --port 8123 --limit 20 --window 10
+#
+# Accepts `limit` requests per sliding `window` seconds and answers the rest with
+# 429 and Retry-After / retry-after-ms headers. With --error-rate it also fails a random
+# share of requests with 429 or 503. Point ChatOpenAI at it with base_url="http://127.0.0.1:8123/v1",
+# and Tavily with langchain_community.utilities.tavily_search.TAVILY_API_URL="http://127.0.0.1:8123".
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port:int=0, limit:int=20, window:float=10.0, latency:float=0.05, error_rate:float=0.0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.error_rate = error_rate
+        self.accepted = deque()
+        self.responses = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def admit(self) -> float:
+        # Returns 0 when the request is admitted, else the seconds until a slot frees up
+        with self.lock:
+            now = time.monotonic()
+            while self.accepted and now - self.accepted[0] >= self.window:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.limit:
+                return self.window - (now - self.accepted[0])
+            self.accepted.append(now)
+            return 0.0
+
+    def start(self) -> "FakeOpenAIServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status:int, body:dict, headers:dict=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.responses[status] += 1
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        if random.random() < server.error_rate:
+            status = random.choice([429, 503])
+            self.send_json(status, {"error":{"message":"Injected failure", "type":"server_error", "code":None}}, {"retry-after":"1"})
+            return
+        wait = server.admit()
+        if wait:
+            headers = {"retry-after":str(max(int(wait + 0.999), 1)), "retry-after-ms":str(int(wait * 1000))}
+            self.send_json(429, {"error":{"message":"Rate limit reached for requests", "type":"requests", "code":"rate_limit_exceeded"}}, headers)
+            return
+        time.sleep(server.latency)
+        if self.path.rstrip("/").endswith("/search"):
+            # Tavily search API
+            query = request.get("query", "")
+            self.send_json(200, {"query":query, "results":[
+                {"title":f"Result {i}", "url":f"https://example.com/{i}", "content":f"About {query}", "score":0.9} for i in range(request.get("max_results") or 3)
+            ]})
+            return
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        self.send_json(200, {
+            "id":"chatcmpl-fake",
+            "object":"chat.completion",
+            "created":int(time.time()),
+            "model":request.get("model", "gpt-4o"),
+            "choices":[{"index":0, "message":{"role":"assistant", "content":"ok"}, "finish_reason":"stop"}],
+            "usage":{"prompt_tokens":prompt_tokens, "completion_tokens":1, "total_tokens":prompt_tokens + 1},
+        })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a throttling fake of the OpenAI chat completions API.")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--limit", type=int, default=20, help="requests admitted per window")
+    parser.add_argument("--window", type=float, default=10.0, help="seconds")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failed at random")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(args.port, args.limit, args.window, args.latency, args.error_rate)
+    print(f"listening on {server.base_url}")
+    server.serve_forever()
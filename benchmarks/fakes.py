@@ -0,0 +1,161 @@
+# Deterministic stand-ins for the OpenAI chat model and the Tavily/Wikipedia backends,
+# so the graph can be benchmarked on a machine without network access.
+import asyncio
+import random
+import re
+import time
+from collections import Counter
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+import citations
+import context_builder
+
+LOREM = (
+    "battery camera display price performance charging durability design software update "
+    "storage weight speaker comparison upgrade value review everyday"
+).split()
+
+def fake_text(n_tokens:int, seed:int=0) -> str:
+    return " ".join(LOREM[(seed + i) % len(LOREM)] for i in range(n_tokens))
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that sleeps for `latency` seconds, plus `output_latency` per output token,
+    and returns `output_tokens` words. A `spike_rate` share of calls takes `spike_latency`
+    seconds longer, like a slow replica behind the API.
+
+    Structured output returns schema instances built by `structured_output`, a dict
+    of schema name to a function of the call index and the prompt messages.
+    """
+
+    latency: float = 0.0
+    output_latency: float = 0.0
+    output_tokens: int = 200
+    spike_rate: float = 0.0
+    spike_latency: float = 0.0
+    structured_output: dict = {}
+    calls: Counter = Counter()
+    rng: random.Random = random.Random(0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _message(self, messages, schema:str=None) -> tuple:
+        # The reply and how long it takes; structured replies carry the schema instance as JSON
+        prompt_tokens = sum(context_builder.count_tokens(str(m.content)) for m in messages)
+        if schema is not None:
+            self.calls[schema] += 1
+            content = self.structured_output[schema](self.calls[schema], messages).model_dump_json()
+            output_tokens = context_builder.count_tokens(content)
+        else:
+            self.calls["text"] += 1
+            # Cite the first source IDs found in the prompt (except the example ID in the instructions)
+            ids = [id for id in dict.fromkeys(re.findall(citations.ID_PATTERN, "\n".join(str(m.content) for m in messages))) if id != "S1a2b3c"][:2]
+            content = "## Insights\n" + fake_text(self.output_tokens, self.calls["text"]) + "".join(f" [{id}]" for id in ids)
+            output_tokens = self.output_tokens
+        message = AIMessage(
+            content=content,
+            usage_metadata={"input_tokens":prompt_tokens, "output_tokens":output_tokens, "total_tokens":prompt_tokens + output_tokens},
+        )
+        return message, self._delay(output_tokens)
+
+    def _delay(self, output_tokens:int) -> float:
+        spike = self.spike_latency if self.spike_rate and self.rng.random() < self.spike_rate else 0.0
+        return self.latency + self.output_latency * output_tokens + spike
+
+    def _generate(self, messages, stop=None, run_manager=None, schema:str=None, **kwargs):
+        message, delay = self._message(messages, schema)
+        time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, schema:str=None, **kwargs):
+        message, delay = self._message(messages, schema)
+        await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(self, schema, **kwargs):
+        # A model call like any other (its usage reaches the callbacks), parsed into the schema
+        return self.bind(schema=schema.__name__) | RunnableLambda(lambda message: schema.model_validate_json(message.content))
+
+def requested_count(messages, default:int) -> int:
+    # Number of items a prompt asks for ("top 3 themes", "Create 10 customer personas", "List 4 distinct themes")
+    match = re.search(r"(?:top|Create|List) (\d+)", "\n".join(str(m.content) for m in messages))
+    return int(match.group(1)) if match else default
+
+def structured_outputs(max_customers:int, duplicate_every:int=0) -> dict:
+    """Builders for the graph's structured outputs.
+
+    Personas get distinct random descriptions; with `duplicate_every` set, every
+    n-th persona repeats the previous one's description under another name.
+    """
+    from shared import Customer, Perspective, SearchQuery, Themes
+    personas = Counter()
+
+    def persona(i:int):
+        personas["made"] += 1
+        made = personas["made"]
+        seed = made - 1 if duplicate_every and made % duplicate_every == 0 else made
+        rng = random.Random(seed)
+        description = " ".join(rng.choice(LOREM) for _ in range(30))
+        return Customer(name=f"Customer {made - 1}", occupation=rng.choice(LOREM).title(), age=20 + made % 50, description=description)
+
+    return {
+        "Perspective":lambda call, messages: Perspective(customers=[persona(i) for i in range(requested_count(messages, max_customers))]),
+        "Customer":lambda call, messages: Customer(name=f"Customer r{call}", occupation="Tester", age=30, description=fake_text(30, call)),
+        "SearchQuery":lambda call, messages: SearchQuery(search_query=f"query {call % 7}"),
+        "Themes":lambda call, messages: Themes(themes=[f"theme {i}" for i in range(requested_count(messages, 1))]),
+    }
+
+class FakeTavily:
+    # Stands in for TavilySearchResults and its api_wrapper
+    search_depth = "advanced"
+    include_domains = []
+    exclude_domains = []
+    include_answer = False
+    include_raw_content = False
+    include_images = False
+
+    def __init__(self, latency:float=0.0, max_results:int=3):
+        self.latency = latency
+        self.max_results = max_results
+        self.calls = 0
+        self.api_wrapper = self
+
+    def _results(self, query:str) -> list:
+        self.calls += 1
+        return [{"url":f"https://example.com/{query.replace(' ', '-')}/{i}", "content":fake_text(150, i)} for i in range(self.max_results)]
+
+    def invoke(self, query:str) -> list:
+        time.sleep(self.latency)
+        return self._results(query)
+
+    async def ainvoke(self, query:str) -> list:
+        await asyncio.sleep(self.latency)
+        return self._results(query)
+
+    async def raw_results_async(self, query:str, **kwargs) -> dict:
+        return {"results":await self.ainvoke(query)}
+
+    def clean_results(self, results:list) -> list:
+        return results
+
+class FakeWikipediaLoader:
+    latency = 0.0
+    calls = 0
+
+    def __init__(self, query:str, load_max_docs:int=2):
+        self.query = query
+        self.load_max_docs = load_max_docs
+
+    def load(self) -> list:
+        from langchain_core.documents import Document
+        time.sleep(self.latency)
+        type(self).calls += 1
+        return [
+            Document(page_content="\n\n".join(fake_text(100, i + p) for p in range(20)), metadata={"source":f"https://en.wikipedia.org/wiki/{self.query.replace(' ', '_')}_{i}"})
+            for i in range(self.load_max_docs)
+        ]
@@ -0,0 +1,133 @@
+# Measure the orchestration cost of finalize.graph with fake LLM and search backends.
+#
+#   python -m benchmarks.graph --customers 1 3 5 --turns 1 2 3 --out benchmark.json
+#
+# For every (max_customers, max_num_turns) pair it records wall time, time per node,
+# peak Python memory, checkpoint size and LLM/search call counts, and writes them as JSON.
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langgraph.checkpoint.memory import MemorySaver
+
+import checkpoint
+import finalize
+import instrumentation
+import retrieval_cache
+import section_store
+import singleflight
+from benchmarks.fakes import FakeChatModel, FakeTavily, FakeWikipediaLoader, structured_outputs
+
+class NodeTimer(AsyncCallbackHandler):
+    # Graph nodes run as chains named after the node; time each of them
+    def __init__(self):
+        self.started = {}
+        self.seconds = defaultdict(float)
+        self.runs = Counter()
+
+    async def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name", name) == node:
+            self.started[run_id] = (node, time.perf_counter())
+
+    async def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self.started:
+            node, start = self.started.pop(run_id)
+            self.seconds[node] += time.perf_counter() - start
+            self.runs[node] += 1
+
+    on_chain_error = on_chain_end
+
+def stored_bytes(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, dict):
+        return sum(stored_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(stored_bytes(v) for v in value)
+    return 0
+
+async def run_once(max_customers:int, max_num_turns:int, llm_latency:float, search_latency:float, output_tokens:int, report_fan_in:int) -> dict:
+    llm = FakeChatModel(latency=llm_latency, output_tokens=output_tokens, structured_output=structured_outputs(max_customers), calls=Counter(), callbacks=[instrumentation.usage_handler])
+    tavily = FakeTavily(latency=search_latency)
+    FakeWikipediaLoader.latency = search_latency
+    FakeWikipediaLoader.calls = 0
+    finalize.llm = llm
+    finalize.tavily_search = tavily
+    finalize.WikipediaLoader = FakeWikipediaLoader
+    finalize.search_cache = retrieval_cache.RetrievalCache(":memory:")
+    finalize.section_cache = section_store.SectionStore(":memory:")
+    finalize.searches = singleflight.SingleFlight()
+
+    # No interrupt: the customers are approved as generated
+    saver = MemorySaver(serde=checkpoint.serializer())
+    graph = finalize.builder.compile(checkpointer=saver)
+    timer = NodeTimer()
+    config = {"configurable":{"thread_id":"benchmark"}, "callbacks":[timer]}
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await graph.ainvoke({"topic":"the latest phone", "max_customers":max_customers, "max_num_turns":max_num_turns, "report_fan_in":report_fan_in}, config)
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "max_customers":max_customers,
+        "max_num_turns":max_num_turns,
+        "wall_seconds":round(wall, 4),
+        "node_seconds":{node:round(seconds, 4) for node, seconds in sorted(timer.seconds.items())},
+        "node_runs":dict(sorted(timer.runs.items())),
+        "peak_memory_bytes":peak,
+        "checkpoint_bytes":stored_bytes([saver.storage, saver.writes, saver.blobs]),
+        "llm_calls":dict(llm.calls),
+        "search_calls":{"tavily":tavily.calls, "wikipedia":FakeWikipediaLoader.calls},
+        "coalesced_searches":finalize.searches.stats()["shared"],
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+async def main(args):
+    runs = []
+    for max_customers in args.customers:
+        for max_num_turns in args.turns:
+            run = await run_once(max_customers, max_num_turns, args.llm_latency, args.search_latency, args.output_tokens, args.report_fan_in)
+            print(f"customers={max_customers} turns={max_num_turns} wall={run['wall_seconds']}s")
+            runs.append(run)
+    result = {
+        "commit":git_commit(),
+        "llm_latency":args.llm_latency,
+        "search_latency":args.search_latency,
+        "output_tokens":args.output_tokens,
+        "report_fan_in":args.report_fan_in,
+        "runs":runs,
+    }
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark finalize.graph with fake LLM and search backends.")
+    parser.add_argument("--customers", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--turns", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="seconds per fake search call")
+    parser.add_argument("--output-tokens", type=int, default=200, help="words returned by each fake completion")
+    parser.add_argument("--report-fan-in", type=int, default=finalize.DEFAULT_REPORT_FAN_IN, help="sections merged per report LLM call")
+    parser.add_argument("--out", default="benchmark.json")
+    asyncio.run(main(parser.parse_args()))
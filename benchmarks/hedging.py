@@ -0,0 +1,88 @@
+# Measure request hedging against a fake chat model with latency spikes.
+#
+#   python -m benchmarks.hedging --calls 400 --latency 0.05 --spike-rate 0.05 --spike-latency 1.0
+#
+# Sends --calls requests through concurrency.ainvoke, --concurrency at a time, with hedging
+# off, hedging at --percentile to the same model, and hedging to a fallback model without
+# spikes, and reports latency percentiles and the hedge rate (each hedge is one extra request).
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from langchain_core.messages import HumanMessage
+
+import concurrency
+import hedging
+import rate_limit
+from benchmarks.fakes import FakeChatModel
+
+def percentile(values:list, p:float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+async def run_once(name:str, hedger:hedging.Hedger, use_fallback:bool, args) -> dict:
+    llm = FakeChatModel(latency=args.latency, output_tokens=20, spike_rate=args.spike_rate, spike_latency=args.spike_latency, calls=Counter(), rng=random.Random(args.seed))
+    fallback = FakeChatModel(latency=args.latency, output_tokens=20, calls=Counter())
+    if use_fallback:
+        hedger.set_fallback(llm, fallback)
+    hedging.reset(hedger)
+    rate_limit.reset()
+    concurrency.set_max_inflight(args.concurrency * 2)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await concurrency.ainvoke(llm, [HumanMessage(content=f"call {i}")])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.calls)))
+    wall = time.perf_counter() - start
+    stats = hedger.stats().get("other", {"hedged":0, "hedge_wins":0})
+    return {
+        "mode":name,
+        "p50":round(percentile(latencies, 50), 3),
+        "p95":round(percentile(latencies, 95), 3),
+        "p99":round(percentile(latencies, 99), 3),
+        "max":round(max(latencies), 3),
+        "hedge_rate":round(stats["hedged"] / args.calls, 3),
+        "hedge_wins":stats["hedge_wins"],
+        "wall_seconds":round(wall, 3),
+    }
+
+async def main(args):
+    options = {"min_samples":args.min_samples, "min_delay":args.min_delay}
+    runs = [
+        await run_once("off", hedging.Hedger(**options), False, args),
+        await run_once(f"p{args.percentile:g}", hedging.Hedger(args.percentile, **options), False, args),
+        await run_once(f"p{args.percentile:g}+fallback", hedging.Hedger(args.percentile, **options), True, args),
+    ]
+    for run in runs:
+        print(
+            f"{run['mode']:<16} p50={run['p50']:<7} p95={run['p95']:<7} p99={run['p99']:<7} max={run['max']:<7} "
+            f"hedged={run['hedge_rate']:<6} hedge_wins={run['hedge_wins']:<4} wall={run['wall_seconds']}s"
+        )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"args":vars(args), "runs":runs}, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare LLM call latency with and without request hedging.")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per normal call")
+    parser.add_argument("--spike-rate", type=float, default=0.05, help="share of calls that are slow")
+    parser.add_argument("--spike-latency", type=float, default=1.0, help="extra seconds of a slow call")
+    parser.add_argument("--percentile", type=float, default=90)
+    parser.add_argument("--min-samples", type=int, default=hedging.DEFAULT_MIN_SAMPLES)
+    parser.add_argument("--min-delay", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    asyncio.run(main(parser.parse_args()))
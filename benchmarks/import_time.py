@@ -0,0 +1,49 @@
+# Measure how long it takes to import the pipeline modules in a fresh interpreter.
+#
+#   python -m benchmarks.import_time --runs 5 --out import_time.json
+#
+# For every module it records the median wall time of `import <module>` over --runs
+# fresh subprocesses, and which heavy dependencies were loaded as a side effect.
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY = ["langchain_openai", "langchain_community", "openai", "numpy", "tiktoken"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds":seconds, "loaded":[m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(module:str, runs:int) -> dict:
+    samples = []
+    loaded = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)], capture_output=True, text=True, check=True).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        samples.append(sample["seconds"])
+        loaded = sample["loaded"]
+    return {"module":module, "median_seconds":round(statistics.median(samples), 4), "min_seconds":round(min(samples), 4), "heavy_modules_loaded":loaded}
+
+def main(args):
+    results = []
+    for module in args.modules:
+        result = measure(module, args.runs)
+        print(f"{module:<12}{result['median_seconds']:>8.3f}s  loaded: {', '.join(result['heavy_modules_loaded']) or '-'}")
+        results.append(result)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"runs":args.runs, "modules":results}, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time importing the pipeline modules in fresh interpreters.")
+    parser.add_argument("modules", nargs="*", default=["shared", "finalize", "main", "batch"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--out")
+    main(parser.parse_args())
@@ -0,0 +1,110 @@
+# Compare latency and cost of finalize.graph between model routing profiles.
+#
+#   python -m benchmarks.model_routing --customers 3 --turns 2
+#   python -m benchmarks.model_routing --profiles profiles.json --out routing.json
+#
+# A profile maps routes to models (the MODEL_ROUTES format, see models). Each model is
+# replaced by a fake whose latency comes from FAKE_MODELS, so profiles can be compared
+# offline; costs use the prices of the models the profile names.
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+from langgraph.checkpoint.memory import MemorySaver
+
+import checkpoint
+import finalize
+import hedging
+import instrumentation
+import models
+import retrieval_cache
+import section_store
+import singleflight
+from benchmarks.fakes import FakeChatModel, FakeTavily, FakeWikipediaLoader, structured_outputs
+
+PROFILES = {
+    "gpt-4o":{},
+    "mini-for-cheap-steps":{
+        "generate_question":{"model":"gpt-4o-mini"},
+        "plan_query":{"model":"gpt-4o-mini", "max_tokens":64},
+        "compress_history":{"model":"gpt-4o-mini"},
+    },
+    "local-query-planning":{
+        "generate_question":{"model":"gpt-4o-mini"},
+        "plan_query":{"model":"llama3.1:8b", "base_url":"http://localhost:11434/v1", "api_key":"ollama", "max_tokens":64},
+    },
+}
+# Fake latency per model: seconds per call and per output token; other models use "local"
+FAKE_MODELS = {
+    "gpt-4o":(0.4, 0.004),
+    "gpt-4o-mini":(0.2, 0.002),
+    "local":(0.1, 0.003),
+}
+
+def fake_factory(max_customers:int, output_tokens:int, scale:float):
+    def build(route:dict, callbacks:list):
+        latency, output_latency = FAKE_MODELS.get(route["model"], FAKE_MODELS["local"])
+        output = min(output_tokens, route.get("max_tokens") or output_tokens)
+        return FakeChatModel(latency=latency * scale, output_latency=output_latency * scale, output_tokens=output,
+                             structured_output=structured_outputs(max_customers), calls=Counter(), callbacks=callbacks)
+    return build
+
+async def run_once(name:str, routes:dict, args) -> dict:
+    registry = models.Registry(routes, factory=fake_factory(args.customers, args.output_tokens, args.latency_scale))
+    models.reset(registry)
+    hedging.reset()
+    instrumentation.reset()
+    finalize.llm = None
+    finalize.tavily_search = FakeTavily(latency=args.search_latency)
+    FakeWikipediaLoader.latency = args.search_latency
+    finalize.WikipediaLoader = FakeWikipediaLoader
+    finalize.search_cache = retrieval_cache.RetrievalCache(":memory:")
+    finalize.section_cache = section_store.SectionStore(":memory:")
+    finalize.searches = singleflight.SingleFlight()
+
+    # No interrupt: the customers are approved as generated
+    graph = finalize.builder.compile(checkpointer=MemorySaver(serde=checkpoint.serializer()))
+    start = time.perf_counter()
+    await graph.ainvoke({"topic":"the latest phone", "max_customers":args.customers, "max_num_turns":args.turns}, {"configurable":{"thread_id":name}})
+    wall = time.perf_counter() - start
+
+    costs = registry.costs()
+    return {
+        "profile":name,
+        "routes":{route:registry.route(route)["model"] for route in models.ROUTES},
+        "wall_seconds":round(wall, 3),
+        "node_seconds":{row["node"]:round(row["seconds"], 3) for row in instrumentation.summary()},
+        "models":costs,
+        "usd":round(sum(row["usd"] for row in costs.values()), 6),
+    }
+
+async def main(args):
+    profiles = PROFILES
+    if args.profiles:
+        with open(args.profiles) as f:
+            profiles = json.load(f)
+    runs = [await run_once(name, routes, args) for name, routes in profiles.items()]
+    for run in runs:
+        calls = ", ".join(f"{model}: {row['calls']}" for model, row in sorted(run["models"].items()))
+        print(f"{run['profile']:<24} wall={run['wall_seconds']:<7}s usd={run['usd']:<10} calls=({calls})")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"args":vars(args), "fake_models":FAKE_MODELS, "runs":runs}, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model routing profiles on finalize.graph with fake models.")
+    parser.add_argument("--profiles", help="JSON file of profile name to routes (default: built-in profiles)")
+    parser.add_argument("--customers", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--output-tokens", type=int, default=200, help="words returned by each fake completion")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for the fake model latencies")
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--out")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,61 @@
+# Compare answer-context size and assembly time with and without the passage index.
+# Runs offline on synthetic Wikipedia-sized documents:
+#   python -m benchmarks.passage_index
+import json
+import random
+import time
+
+import citations
+import context_builder
+
+random.seed(0)
+# Rough GPT-4o prompt processing rate, used to turn prompt tokens into an estimated latency
+PREFILL_TOKENS_PER_SECOND = 5000
+FILLER = [f"word{i}" for i in range(5000)]
+TOPIC = "battery life charging hours screen brightness standby drain".split()
+
+def paragraph(relevant:bool) -> str:
+    words = random.choices(FILLER, k=random.randint(60, 140))
+    if relevant:
+        words += random.choices(TOPIC, k=12)
+        random.shuffle(words)
+    return " ".join(words)
+
+def documents(n_docs:int, paragraphs_per_doc:int) -> list:
+    docs = []
+    for i in range(n_docs):
+        content = "\n\n".join(paragraph(relevant=random.random() < 0.1) for _ in range(paragraphs_per_doc))
+        source = f"https://en.wikipedia.org/wiki/Doc_{i}"
+        docs.append({"id":citations.source_id("wikipedia", source), "backend":"wikipedia", "source":source, "page":"", "content":content, "turn":i // 4})
+    return docs
+
+def measure(docs:list, query:str, top_k:int, repeat:int=20) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        context = context_builder.assemble(docs, query=query, token_budget=10**9, top_k=top_k)
+    elapsed = (time.perf_counter() - start) / repeat
+    tokens = context_builder.count_tokens(context)
+    return {
+        "prompt_tokens":tokens,
+        "assembly_ms":round(elapsed * 1000, 2),
+        "estimated_prefill_ms":round(tokens / PREFILL_TOKENS_PER_SECOND * 1000, 1),
+    }
+
+def main():
+    query = "How long does the battery last and how fast is charging?"
+    results = []
+    for n_docs, paragraphs_per_doc in [(4, 40), (8, 40), (16, 60)]:
+        docs = documents(n_docs, paragraphs_per_doc)
+        full = measure(docs, query, top_k=0)
+        indexed = measure(docs, query, top_k=context_builder.DEFAULT_TOP_K)
+        results.append({
+            "documents":n_docs,
+            "paragraphs_per_document":paragraphs_per_doc,
+            "full_documents":full,
+            "top_k_passages":indexed,
+            "prompt_token_reduction":round(1 - indexed["prompt_tokens"] / full["prompt_tokens"], 3),
+        })
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
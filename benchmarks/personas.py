@@ -0,0 +1,58 @@
+# Measure persona generation wall time against max_customers, in one call or in parallel shards.
+#
+#   python -m benchmarks.personas --customers 10 30 60 100 --shard-size 10
+#
+# The fake model's latency grows with the size of its output, like token decoding does,
+# and every --duplicate-every-th persona it returns is a near-duplicate of the one before.
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import finalize
+import personas
+from benchmarks.fakes import FakeChatModel, structured_outputs
+
+async def run_once(max_customers:int, shard_size:int, args) -> dict:
+    llm = FakeChatModel(latency=args.latency, output_latency=args.output_latency, structured_output=structured_outputs(max_customers, args.duplicate_every), calls=Counter())
+    finalize.llm = llm
+    start = time.perf_counter()
+    customers = (await finalize.create_customers({"topic":"the latest phone", "max_customers":max_customers, "persona_shard_size":shard_size}))["customers"]
+    wall = time.perf_counter() - start
+    duplicates = len(customers) - len(personas.dedupe(customers))
+    return {
+        "max_customers":max_customers,
+        "persona_shard_size":shard_size,
+        "wall_seconds":round(wall, 3),
+        "customers":len(customers),
+        "near_duplicates_left":duplicates,
+        "llm_calls":dict(llm.calls),
+    }
+
+async def main(args):
+    runs = []
+    for max_customers in args.customers:
+        # A shard size of max_customers is the single-call baseline
+        for shard_size in dict.fromkeys((max_customers, args.shard_size)):
+            run = await run_once(max_customers, shard_size, args)
+            mode = "single" if shard_size >= max_customers else f"shards of {shard_size}"
+            print(f"customers={max_customers:<4} {mode:<14} wall={run['wall_seconds']:<7}s personas={run['customers']:<4} duplicates={run['near_duplicates_left']:<3} calls={run['llm_calls']}")
+            runs.append(run)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"latency":args.latency, "output_latency":args.output_latency, "duplicate_every":args.duplicate_every, "runs":runs}, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare single-call and sharded persona generation.")
+    parser.add_argument("--customers", type=int, nargs="+", default=[10, 30, 60, 100])
+    parser.add_argument("--shard-size", type=int, default=finalize.DEFAULT_PERSONA_SHARD_SIZE)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per fake LLM call")
+    parser.add_argument("--output-latency", type=float, default=0.002, help="seconds per output token")
+    parser.add_argument("--duplicate-every", type=int, default=7)
+    parser.add_argument("--out")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+# Exercise rate_limit against a local server that throttles like OpenAI.
+#
+#   python -m benchmarks.rate_limit --calls 60 --limit 20 --window 5
+#
+# Fires --calls concurrent ChatOpenAI requests through concurrency.ainvoke, and as many Tavily
+# searches through finalize.tavily_results, once with retries disabled and once with the
+# limiter (retries, backoff, adaptive concurrency and, with --client-rpm, a request bucket),
+# and reports successes, failures and 429s seen.
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("NO_PROXY", "127.0.0.1,localhost")
+
+from langchain_core.messages import HumanMessage
+
+import concurrency
+import finalize
+import rate_limit
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+def openai_caller(base_url:str):
+    from langchain_openai import ChatOpenAI
+    llm = ChatOpenAI(model="gpt-4o", base_url=base_url, api_key="fake", max_retries=0)
+    return lambda i: concurrency.ainvoke(llm, [HumanMessage(content=f"call {i}")])
+
+def tavily_caller(base_url:str):
+    import langchain_community.utilities.tavily_search as tavily_api
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+    # The Tavily wrapper posts to {TAVILY_API_URL}/search
+    tavily_api.TAVILY_API_URL = base_url.removesuffix("/v1")
+    tavily_search = TavilySearchResults(max_results=3, api_wrapper=TavilySearchAPIWrapper(tavily_api_key="fake"))
+    return lambda i: concurrency.call("tavily", lambda: finalize.tavily_results(tavily_search, f"query {i}"))
+
+async def run_once(name:str, provider:rate_limit.Provider, caller, args) -> dict:
+    server = FakeOpenAIServer(limit=args.limit, window=args.window, latency=args.latency, error_rate=args.error_rate).start()
+    request = caller(server.base_url)
+    rate_limit.providers[provider.name] = provider
+    concurrency.set_max_inflight(args.calls)
+
+    async def one(i):
+        try:
+            await request(i)
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(args.calls)))
+    wall = time.perf_counter() - start
+    server.shutdown()
+    return {
+        "mode":name,
+        "provider":provider.name,
+        "succeeded":sum(results),
+        "failed":len(results) - sum(results),
+        "server_responses":{str(status):count for status, count in sorted(server.responses.items())},
+        "wall_seconds":round(wall, 3),
+        **provider.stats(),
+    }
+
+async def main(args):
+    runs = []
+    for name, caller in (("openai", openai_caller), ("tavily", tavily_caller)):
+        runs.append(await run_once("no retries", rate_limit.Provider(name, max_retries=0), caller, args))
+        runs.append(await run_once("limiter", rate_limit.Provider(name, requests_per_minute=args.client_rpm, max_retries=args.max_retries, base_delay=0.25, max_delay=args.window), caller, args))
+    for run in runs:
+        print(f"{run['provider']:<7} {run['mode']:<12} ok={run['succeeded']:<4} failed={run['failed']:<4} responses={run['server_responses']} wall={run['wall_seconds']}s concurrency={run['concurrency_limit']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"calls":args.calls, "limit":args.limit, "window":args.window, "runs":runs}, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare calls against a throttling fake OpenAI server with and without the rate limiter.")
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--limit", type=int, default=20, help="requests the server admits per window")
+    parser.add_argument("--window", type=float, default=5.0, help="seconds")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--client-rpm", type=float, default=0, help="request bucket of the limiter (0 for none)")
+    parser.add_argument("--max-retries", type=int, default=10)
+    parser.add_argument("--out")
+    asyncio.run(main(parser.parse_args()))
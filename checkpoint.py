@@ -0,0 +1,85 @@
+import asyncio
+import os
+import sqlite3
+from collections import Counter
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+class DurableSqliteSaver(SqliteSaver):
+    """SQLite checkpointer (WAL mode) usable from the async graph API.
+
+    SqliteSaver only implements the sync API; its connection is shared behind a
+    lock, so the async methods run the sync ones in a worker thread. Every
+    `prune_every` checkpoints of a thread, checkpoints superseded by the latest
+    one in each namespace are deleted together with their pending writes.
+    """
+
+    def __init__(self, conn:sqlite3.Connection, prune_every:int=20, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.prune_every = prune_every
+        self._puts = Counter()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        self._puts[thread_id] += 1
+        if self.prune_every and self._puts[thread_id] % self.prune_every == 0:
+            self.prune([thread_id])
+        return result
+
+    def prune(self, thread_ids, *, strategy:str="keep_latest"):
+        # No DeltaChannel is used by these graphs, so the latest checkpoint of a
+        # namespace holds every channel value and older ones are never read on resume
+        with self.cursor() as cur:
+            for thread_id in thread_ids:
+                if strategy == "delete":
+                    cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (str(thread_id),))
+                    cur.execute("DELETE FROM writes WHERE thread_id = ?", (str(thread_id),))
+                    continue
+                latest = """SELECT checkpoint_ns, MAX(checkpoint_id) FROM checkpoints
+                            WHERE thread_id = ? GROUP BY checkpoint_ns"""
+                cur.execute(
+                    f"DELETE FROM checkpoints WHERE thread_id = ? AND (checkpoint_ns, checkpoint_id) NOT IN ({latest})",
+                    (str(thread_id), str(thread_id)),
+                )
+                cur.execute(
+                    f"DELETE FROM writes WHERE thread_id = ? AND (checkpoint_ns, checkpoint_id) NOT IN ({latest})",
+                    (str(thread_id), str(thread_id)),
+                )
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids, *, strategy:str="keep_latest"):
+        return await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+# Types of the graph state that checkpoints may restore besides LangChain's own (messages)
+ALLOWED_MSGPACK_MODULES = [("shared", "Customer")]
+
+def serializer() -> JsonPlusSerializer:
+    return JsonPlusSerializer(allowed_msgpack_modules=ALLOWED_MSGPACK_MODULES)
+
+def from_env():
+    # CHECKPOINT_DB=.cache/checkpoints.sqlite keeps runs across restarts; unset keeps them in memory
+    path = os.environ.get("CHECKPOINT_DB")
+    if not path:
+        return MemorySaver(serde=serializer())
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    return DurableSqliteSaver(conn, prune_every=int(os.environ.get("CHECKPOINT_PRUNE_EVERY", 20)), serde=serializer())
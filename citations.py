@@ -0,0 +1,74 @@
+# Source bookkeeping for citations.
+#
+# Every retrieved document gets a short ID derived from its backend, source and page, and
+# the prompts ask the model to cite that ID, e.g. [S1a2b3c], instead of numbering and listing
+# sources itself. Sources travel next to the text as records, and render() numbers them
+# [1], [2], ... in order of first citation and writes the ## Sources list.
+import hashlib
+import re
+
+ID_PATTERN = r"\bS[0-9a-f]{6}\b"
+CITATION = re.compile(rf"\[\s*({ID_PATTERN}(?:\s*[,;]\s*{ID_PATTERN})*)\s*\]")
+
+def source_id(backend:str, source:str, page="") -> str:
+    return "S" + hashlib.sha1(f"{backend}\x00{source}\x00{page}".encode()).hexdigest()[:6]
+
+def source_record(doc:dict) -> dict:
+    return {"id":doc["id"], "backend":doc["backend"], "source":doc["source"], "page":doc["page"]}
+
+def cited_ids(text:str) -> list:
+    # IDs cited in `text`, in order of first citation
+    ids = []
+    for match in CITATION.finditer(text):
+        for id in re.findall(ID_PATTERN, match.group(1)):
+            if id not in ids:
+                ids.append(id)
+    return ids
+
+def cited_sources(text:str, documents:list) -> list:
+    # Source records of the documents cited in `text`
+    records = merge_sources([source_record(doc) for doc in documents])
+    by_id = {record["id"]:record for record in records}
+    return [by_id[id] for id in cited_ids(text) if id in by_id]
+
+def merge_sources(*source_lists) -> list:
+    merged = {}
+    for sources in source_lists:
+        for record in sources:
+            merged.setdefault(record["id"], record)
+    return list(merged.values())
+
+def format_source(record:dict) -> str:
+    if record["page"] != "":
+        return f'{record["source"]}, page {record["page"]}'
+    return record["source"]
+
+def strip_headings(text:str) -> str:
+    # Drop the ## Insights title and any source list the model wrote on its own
+    text = re.sub(r"^\s*#+\s*Insights\s*\n", "", text)
+    return re.split(r"\n\s*#+\s*Sources\s*\n", "\n" + text)[0].strip()
+
+def render(content:str, sources:list, note:str="") -> str:
+    """Return `content` as an ## Insights / ## Sources report with sources numbered in citation order.
+
+    Citations of IDs that are not in `sources` are dropped; `note` is added after the insights.
+    """
+    known = {record["id"]:record for record in sources}
+    numbers = {}
+
+    def renumber(match):
+        ids = [id for id in re.findall(ID_PATTERN, match.group(1)) if id in known]
+        for id in ids:
+            numbers.setdefault(id, len(numbers) + 1)
+        return "".join(f"[{numbers[id]}]" for id in ids)
+
+    body = CITATION.sub(renumber, strip_headings(content))
+    # Tidy the spaces left where unknown citations were dropped
+    body = re.sub(r"[ \t]+([.,;:])", r"\1", body)
+    body = re.sub(r"(\S)[ \t]{2,}(?=\S)", r"\1 ", body)
+    report = "## Insights\n\n" + body
+    if note:
+        report += "\n\n" + note
+    if numbers:
+        report += "\n\n## Sources\n" + "\n".join(f"[{number}] {format_source(known[id])}" for id, number in numbers.items())
+    return report
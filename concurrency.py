@@ -0,0 +1,87 @@
+import asyncio
+import os
+import weakref
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage, convert_to_messages
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables.config import ensure_config, get_async_callback_manager_for_config, merge_configs
+from langgraph.constants import TAG_NOSTREAM
+
+import hedging
+import rate_limit
+import timeouts
+
+# Cap on LLM and search calls in flight at once, shared by every interview in the process.
+# Read from MAX_INFLIGHT_CALLS when the first semaphore is created, after .env is loaded.
+max_inflight = None
+
+_semaphores = weakref.WeakKeyDictionary()
+
+def set_max_inflight(limit:int):
+    global max_inflight
+    max_inflight = limit
+    _semaphores.clear()
+
+def semaphore() -> asyncio.Semaphore:
+    # asyncio primitives belong to one event loop, so keep one semaphore per loop
+    global max_inflight
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        if max_inflight is None:
+            max_inflight = int(os.environ.get("MAX_INFLIGHT_CALLS", 8))
+        _semaphores[loop] = asyncio.Semaphore(max_inflight)
+    return _semaphores[loop]
+
+async def call(provider:str, afunc, tokens:int=0):
+    # Await afunc() within the provider's rate limits (see rate_limit) and the in-flight cap
+    async def limited():
+        async with semaphore():
+            # A hung attempt times out and is retried like any other transient failure
+            return await asyncio.wait_for(afunc(), timeouts.call_timeout(provider))
+    return await rate_limit.get(provider).call(limited, tokens)
+
+class FirstToken(AsyncCallbackHandler):
+    # Set once a call streams its first token; a call that doesn't stream never sets it
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def on_llm_new_token(self, token, **kwargs):
+        self.started.set()
+
+async def emit(config:dict, input, message):
+    # Hand a hedge's message to the stream callbacks of the call it replaced, in one piece
+    if TAG_NOSTREAM in config["tags"] or not isinstance(message, BaseMessage):
+        return
+    manager = get_async_callback_manager_for_config(config)
+    run_managers = await manager.on_chat_model_start({"name":"hedge"}, [convert_to_messages(input)])
+    await run_managers[0].on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+
+async def ainvoke(runnable, input, config=None, provider:str="openai", fallback=None, fallback_provider:str=None):
+    # For chat models: calls are timed per node and, when hedging is on, raced against a duplicate
+    # of `fallback` (by default the one registered for the runnable) if no token has arrived by the
+    # hedge delay. The duplicate doesn't stream, so streamed output never interleaves
+    tokens = rate_limit.estimate_tokens(input)
+    config = ensure_config(config)
+    fallback = fallback or hedging.get().fallback_for(runnable)
+    first_token = FirstToken()
+    primary_config = merge_configs(config, {"callbacks":[first_token]})
+    hedge_config = merge_configs(config, {"tags":[TAG_NOSTREAM]})
+    hedges = []
+
+    async def hedge():
+        hedges.append(await call(fallback_provider or provider, lambda: fallback.ainvoke(input, hedge_config), tokens))
+        return hedges[0]
+
+    result = await hedging.get().call(
+        lambda: call(provider, lambda: runnable.ainvoke(input, primary_config), tokens),
+        hedge,
+        started=first_token.started,
+    )
+    if hedges and result is hedges[0]:
+        await emit(config, input, result)
+    return result
+
+async def to_thread(provider:str, func, *args):
+    # For blocking clients without an async API (e.g. WikipediaLoader)
+    return await call(provider, lambda: asyncio.to_thread(func, *args))
@@ -0,0 +1,91 @@
+import re
+from functools import lru_cache
+
+import citations
+
+DEFAULT_TOKEN_BUDGET = 6000
+DEFAULT_TOP_K = 8
+
+@lru_cache(maxsize=None)
+def encoding(model:str="gpt-4o"):
+    # tiktoken downloads its BPE files on first use; without network fall back to an estimate
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+def count_tokens(text:str, model:str="gpt-4o") -> int:
+    enc = encoding(model)
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate(text:str, max_tokens:int, model:str="gpt-4o") -> str:
+    enc = encoding(model)
+    if enc is None:
+        return text[:max_tokens * 4]
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+def web_document(doc:dict, turn:int) -> dict:
+    return {"id":citations.source_id("tavily", doc["url"]), "backend":"tavily", "source":doc["url"], "page":"", "content":doc["content"], "turn":turn}
+
+def wikipedia_document(doc:dict, turn:int) -> dict:
+    metadata = doc["metadata"]
+    page = metadata.get("page", "")
+    return {"id":citations.source_id("wikipedia", metadata["source"], page), "backend":"wikipedia", "source":metadata["source"], "page":page, "content":doc["page_content"], "turn":turn}
+
+def format_document(doc:dict) -> str:
+    if doc["backend"] == "tavily":
+        return f'<Document id="{doc["id"]}" href="{doc["source"]}"/>\n{doc["content"]}\n</Document>'
+    return f'<Document id="{doc["id"]}" source="{doc["source"]}" page="{doc["page"]}"/>\n{doc["content"]}\n</Document>'
+
+def format_documents(documents:list) -> str:
+    return "\n\n---\n\n".join(format_document(doc) for doc in documents)
+
+def dedupe(documents:list) -> list:
+    # Keep the latest copy of each source/page so repeated hits don't repeat in the prompt
+    latest = {}
+    for doc in documents:
+        latest.pop((doc["source"], doc["page"]), None)
+        latest[(doc["source"], doc["page"])] = doc
+    return list(latest.values())
+
+def _terms(text:str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+def assemble(documents:list, query:str="", token_budget:int=DEFAULT_TOKEN_BUDGET, top_k:int=DEFAULT_TOP_K) -> str:
+    """Pack the most recent and most relevant unique documents into `token_budget` tokens.
+
+    With `top_k` set, documents are split into passages and only the `top_k`
+    passages that best match `query` (BM25) are considered.
+    """
+    documents = dedupe(documents)
+    if not documents:
+        return ""
+    if top_k:
+        import passage_index
+        ranked = passage_index.PassageIndex.from_documents(documents).search(query, top_k)
+    else:
+        query_terms = _terms(query)
+        latest_turn = max(doc["turn"] for doc in documents)
+
+        def score(doc):
+            overlap = len(query_terms & _terms(doc["content"])) / len(query_terms) if query_terms else 0.0
+            recency = 1.0 / (1 + latest_turn - doc["turn"])
+            return overlap + recency
+
+        ranked = sorted(documents, key=score, reverse=True)
+
+    packed = []
+    remaining = token_budget
+    for doc in ranked:
+        cost = count_tokens(format_document(doc)) + 5
+        if cost <= remaining:
+            packed.append(doc)
+            remaining -= cost
+        elif not packed:
+            # Nothing fits yet: truncate the best document rather than send no context
+            packed.append({**doc, "content":truncate(doc["content"], max(remaining - 50, 0))})
+            break
+    return format_documents(packed)
@@ -0,0 +1,45 @@
+# Keeps interview prompts from growing with every turn.
+#
+# With memory_strategy="summary", once the conversation sent to the model exceeds
+# memory_token_threshold tokens, all but the last memory_keep_exchanges question/answer
+# pairs are folded into a running summary. Sources cited in the folded answers are
+# listed next to the summary so later answers can still refer to them.
+from langchain_core.messages import HumanMessage
+
+import citations
+import context_builder
+
+DEFAULT_STRATEGY = "full"
+DEFAULT_TOKEN_THRESHOLD = 3000
+DEFAULT_KEEP_EXCHANGES = 2
+
+def summary_message(summary:str, sources:list) -> HumanMessage:
+    content = f"Summary of the interview so far:\n{summary}"
+    if sources:
+        content += "\n\nSources cited so far:\n" + "\n".join(f"[{record['id']}] {citations.format_source(record)}" for record in sources)
+    return HumanMessage(content=content)
+
+def prompt_messages(state:dict) -> list:
+    # The conversation as sent to the model: summary of folded turns, then the turns kept verbatim
+    messages = state["messages"]
+    summarized = state.get("summarized", 0)
+    if not summarized:
+        return messages
+    folded = "\n".join(str(message.content) for message in messages[:summarized])
+    sources = citations.cited_sources(folded, state.get("context", []))
+    return [summary_message(state.get("summary", ""), sources)] + messages[summarized:]
+
+def prompt_tokens(messages:list) -> int:
+    return sum(context_builder.count_tokens(str(message.content)) for message in messages)
+
+def messages_to_fold(state:dict) -> list:
+    # Messages that should move into the summary before the next turn; empty when none should
+    if state.get("memory_strategy", DEFAULT_STRATEGY) != "summary":
+        return []
+    threshold = state.get("memory_token_threshold", DEFAULT_TOKEN_THRESHOLD)
+    if prompt_tokens(prompt_messages(state)) <= threshold:
+        return []
+    messages = state["messages"]
+    keep = 2 * state.get("memory_keep_exchanges", DEFAULT_KEEP_EXCHANGES)
+    end = max(len(messages) - keep, 0)
+    return messages[state.get("summarized", 0):end]
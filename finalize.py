@@ -1,201 +1,334 @@
-from dotenv import load_dotenv
-load_dotenv()
-
-from langchain_openai import ChatOpenAI
 from langgraph.types import Send
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langgraph.graph import MessagesState, START, END, StateGraph
-from langgraph.checkpoint.memory import MemorySaver
-import operator
-from typing import List, Annotated
-from typing_extensions import TypedDict
-from pydantic import BaseModel, Field
-
-llm = ChatOpenAI(model="gpt-4o", temperature=0) 
-
-class Customer(BaseModel):
-    name:str=Field(
-        description="Name of the customer"
-    )
-
-    occupation: str = Field(
-        description="Occupration of the customer"
-    )
-
-    age: int = Field(
-        description="customer's age"
-    )
-
-    description: str = Field(
-        description="Description of the customer focus, concerns, and motives.",
-    )
-    @property
-    def persona(self)-> str:
-        return f"Name: {self.name}\nOccupation:{self.occupation}\nAge:{self.age}\nDescription: {self.description}\n"
-
-class Perspective(BaseModel):
-    customers: List[Customer] = Field(
-        description="Comprehensive list of customers with their occupation and age"
-    )
-
-class GenerateCustomersState(TypedDict):
-    topic: str #Research product
-    max_customers: int # Number of customer
-    human_analyst_feedback: str # Human feedback
-    customers: List[Customer] # Customers writing review
-
-customer_instructions = """You are tasked with creating a set of AI customer personas. Follow these instructions carefully
-1. First, review the product topic: {topic}
-
-2. Examine any editoral feedback that has been optionally provided to guide creation of the analysts: {human_analyst_feedback}
-
-3. Determin the most interesting themes based upon documents and/or feedback above.
-
-4. Pick the top {max_customers} themes.
-
-5. Assign one analyst to each theme."""
-
-def create_customers(state: GenerateCustomersState):
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from langgraph.graph import START, END, StateGraph
+import asyncio
+import re
+import time
+from typing import List
+import citations
+import concurrency
+import context_builder
+import hedging
+import conversation_memory
+import instrumentation
+import models
+import novelty
+import personas
+import rate_limit
+import retrieval_cache
+import section_store
+import singleflight
+import timeouts
+from shared import (
+    Customer,
+    Perspective,
+    Themes,
+    SearchQuery,
+    GenerateCustomersState,
+    InterviewState,
+    InterviewOutputState,
+    ResearchGraphState,
+    ReportGroupState,
+    ReportGroupOutputState,
+    customer_instructions,
+    question_instructions,
+    search_instructions,
+    answer_instructions,
+    section_writer_instructions,
+    report_writer_instructions,
+    revise_customer_instructions,
+    summary_instructions,
+    theme_instructions,
+    customer_shard_instructions,
+)
+
+# Clients are created on first use so that importing this module is fast and works offline
+llm = None
+tavily_search = None
+WikipediaLoader = None
+search_cache = None
+section_cache = None
+# Identical searches issued concurrently by parallel interviews share one fetch
+searches = singleflight.SingleFlight()
+_env_loaded = False
+
+def load_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def get_llm(route:str="default"):
+    # finalize.llm, when set, is used for every step instead of the routed models (e.g. a fake in the benchmarks)
+    if llm is not None:
+        return llm
+    load_env()
+    return models.get().client(route)
+
+async def invoke_llm(route:str, messages:list, config=None, schema=None):
+    # Call the model that `route` is mapped to (see models), with structured output when a schema is given
+    model = get_llm(route)
+    # Resolve the hedge fallback before wrapping: it is registered for the client, not the wrapper
+    fallback = hedging.get().fallback_for(model)
+    if schema is not None:
+        model = model.with_structured_output(schema)
+        fallback = fallback.with_structured_output(schema)
+    provider = "openai" if llm is not None else models.get().provider(route)
+    fallback_provider = "openai" if llm is not None else models.get().fallback_provider(route)
+    return await concurrency.ainvoke(model, messages, config, provider=provider, fallback=fallback, fallback_provider=fallback_provider)
+
+def get_tavily_search():
+    global tavily_search
+    if tavily_search is None:
+        load_env()
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        tavily_search = TavilySearchResults(max_results=3)
+    return tavily_search
+
+def get_wikipedia_loader():
+    global WikipediaLoader
+    if WikipediaLoader is None:
+        from langchain_community.document_loaders import WikipediaLoader
+    return WikipediaLoader
+
+def get_search_cache():
+    # Identical queries are served from disk instead of the network
+    global search_cache
+    if search_cache is None:
+        load_env()
+        search_cache = retrieval_cache.from_env()
+    return search_cache
+
+def targeted_feedback(feedback:str, num_customers:int):
+    # Feedback such as "2: make them a student" (one line per customer) only concerns those
+    # customers; returns {index: feedback}, or None when any line is not addressed to a customer
+    targets = {}
+    for line in feedback.splitlines():
+        if not line.strip():
+            continue
+        # No "-" separator: "1-2 should be students" names a range, which regenerates everyone
+        match = re.match(r"\s*#?(\d+)\s*[:.)]\s*(.+)", line)
+        if not match or not 1 <= int(match.group(1)) <= num_customers:
+            return None
+        index = int(match.group(1)) - 1
+        targets[index] = f"{targets[index]} {match.group(2)}" if index in targets else match.group(2)
+    return targets or None
+
+async def revise_customer(topic:str, customers:List[Customer], index:int, feedback:str):
+    other_customers = "\n".join(c.persona for i, c in enumerate(customers) if i != index)
+    system_message = revise_customer_instructions.format(topic=topic, customer=customers[index].persona, feedback=feedback, other_customers=other_customers)
+    return await invoke_llm("create_customers", [SystemMessage(content=system_message)]+[HumanMessage(content="Generate the revised customer")], schema=Customer)
+
+def get_section_cache():
+    # Sections of customers interviewed on the same topic in an earlier run are reused
+    global section_cache
+    if section_cache is None:
+        load_env()
+        section_cache = section_store.from_env()
+    return section_cache
+
+# Graph input that changes how an interview runs; forwarded to every interview
+interview_settings = ["max_num_turns", "context_token_budget", "passage_top_k", "memory_strategy", "memory_token_threshold", "memory_keep_exchanges", "novelty_threshold"]
+# Routes of the calls an interview's section depends on
+section_routes = ["generate_question", "plan_query", "generate_answer", "compress_history", "write_section"]
+
+def resolved_section_routes() -> dict:
+    # The models (and their settings) of this run, so a section written by other models is not reused
+    load_env()
+    registry = models.get()
+    return {
+        route:{key:value for key, value in registry.route(route).items() if key != "api_key"}
+        for route in section_routes
+    }
+
+async def create_customers(state: GenerateCustomersState):
     topic = state["topic"]
     max_customers= state["max_customers"]
     human_analyst_feedback = state.get("human_analyst_feedback","")
 
-    structured_llm = llm.with_structured_output(Perspective)
+    # Targeted feedback regenerates only the customers it names; the rest are kept verbatim
+    customers = state.get("customers")
+    targets = targeted_feedback(human_analyst_feedback, len(customers)) if customers and human_analyst_feedback else None
+    if targets:
+        revised = await asyncio.gather(*(revise_customer(topic, customers, index, feedback) for index, feedback in targets.items()))
+        customers = list(customers)
+        for index, customer in zip(targets, revised):
+            customers[index] = customer
+        return {"customers":customers}
+
+    if max_customers > state.get("persona_shard_size", DEFAULT_PERSONA_SHARD_SIZE):
+        return {"customers":await create_customers_sharded(state)}
 
     system_message = customer_instructions.format(topic=topic,human_analyst_feedback=human_analyst_feedback, max_customers=max_customers)
 
-    customers = structured_llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of customers")])
+    customers = await invoke_llm("create_customers", [SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of customers")], schema=Perspective)
 
     return {"customers":customers.customers}
 
+DEFAULT_PERSONA_SHARD_SIZE = 10
+# Rounds of extra shards run to replace personas dropped as near-duplicates
+PERSONA_TOP_UP_ROUNDS = 3
+
+async def generate_shard(topic:str, feedback:str, theme:str, themes:list, count:int, existing:list) -> list:
+    other_themes = "; ".join(other for other in themes if other != theme)
+    system_message = customer_shard_instructions.format(topic=topic, human_analyst_feedback=feedback, count=count, theme=theme, other_themes=other_themes, existing=personas.summary(existing) or "(none)")
+    perspective = await invoke_llm("create_customers", [SystemMessage(content=system_message)]+[HumanMessage(content="Generate the set of customers")], schema=Perspective)
+    return perspective.customers
+
+async def create_customers_sharded(state:GenerateCustomersState) -> list:
+    # Large sets are generated as parallel shards with one theme each, then near-duplicates are dropped
+    topic = state["topic"]
+    max_customers = state["max_customers"]
+    feedback = state.get("human_analyst_feedback","")
+    sizes = personas.shard_sizes(max_customers, state.get("persona_shard_size", DEFAULT_PERSONA_SHARD_SIZE))
+
+    system_message = theme_instructions.format(topic=topic, human_analyst_feedback=feedback, num_themes=len(sizes))
+    themes = (await invoke_llm("create_customers", [SystemMessage(content=system_message)]+[HumanMessage(content="List the themes")], schema=Themes)).themes
+    themes = [theme for theme in themes if theme.strip()] or [topic]
+
+    customers = []
+    for _ in range(PERSONA_TOP_UP_ROUNDS + 1):
+        shards = await asyncio.gather(*(
+            generate_shard(topic, feedback, themes[i % len(themes)], themes, size, customers)
+            for i, size in enumerate(sizes)
+        ))
+        for shard in shards:
+            customers += personas.dedupe(shard, customers)
+        missing = max_customers - len(customers)
+        if missing <= 0:
+            break
+        # Top up the shortfall, spreading it over the themes from where the last round stopped
+        sizes = personas.shard_sizes(missing, state.get("persona_shard_size", DEFAULT_PERSONA_SHARD_SIZE))
+        themes = themes[len(shards) % len(themes):] + themes[:len(shards) % len(themes)]
+    return customers[:max_customers]
+
 def human_feedback(state:GenerateCustomersState):
     pass
 
-class InterviewState(MessagesState):
-    max_num_turns:int 
-    context: Annotated[List, operator.add]
-    customer: Customer
-    interview:str
-    sections:list
-
-class SearchQuery(BaseModel):
-    search_query:str = Field(None, description="Search query for retrieval.")
-
-question_instructions="""You are an analyst tasked with interviewing an customer to learn about a specific topic.
-Your goal is boil down to interesting and specific insights related to your topic.
-1. Interesting: Insights that people will find surprising or non-obvious
-2. Specific: Insights the avoid generalities and include specific examples from the customer.
-Here is your topic of focus and set of goals: {goals}
-Begin by introding yourself using a name that fits your persona, and then ask your question.
-Continue to ask questions to drill down and refine your understanding of the topic.
-When you are satisfied with your understanding, complete the interview with "Thank you so much for your help!
-Remember to stay in character throughout your response, reflecting the persona and goals prvided to you.
-"""
-
-def generate_question(state:InterviewState):
+
+def customer_config(customer:Customer):
+    # Tags LLM runs so streamed tokens can be attributed to a customer
+    return {"metadata":{"customer":customer.name}}
+
+async def generate_question(state:InterviewState):
     customer=state["customer"]
-    messages = state["messages"]
+    messages = conversation_memory.prompt_messages(state)
 
     system_message = question_instructions.format(goals=customer.persona)
-    question = llm.invoke([SystemMessage(content=system_message)]+messages)
+    question = await invoke_llm("generate_question", [SystemMessage(content=system_message)]+messages, customer_config(customer))
 
     return {"messages":[question]}
 
 
 #Searching information for answer
-# Web search tool
-from langchain_community.tools.tavily_search import TavilySearchResults
-tavily_search = TavilySearchResults(max_results=3)
-
-# Wikipedia search tool
-from langchain_community.document_loaders import WikipediaLoader
-
-#Search query writing
-search_instructions = SystemMessage(content=f""" You will be given a conversation between an analyst and a customer.
-Your goal is to generate a well-structured query for use in retrieval and / or web-search related to the conversation.
-First, analyze the full converstion.
-Pay particular attention to the final question posed by the analyst.
-Convert this final question into a well-structured web search query""")
-
-def search_web(state:InterviewState):
-    print("search_web")
-
-    structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions]+state['messages'])
-
-    search_docs = tavily_search.invoke(search_query.search_query)
-
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-            for doc in search_docs
-        ]
-    )
-
-    return {"context":[formatted_search_docs]}
-
-def search_wikipedia(state:InterviewState):
-    print("search_wikipedia")
-    structured_llm = llm.with_structured_output(SearchQuery)
-    search_query = structured_llm.invoke([search_instructions]+state['messages'])
-
-    search_docs = WikipediaLoader(query=search_query.search_query, load_max_docs=2).load()
-
-     # Format
-    formatted_search_docs = "\n\n---\n\n".join(
-        [
-            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-            for doc in search_docs
-        ]
-    )
-
-    return {"context":[formatted_search_docs]}
-
-#Generate answer
-answer_instructions = """You are a customer being interviewed by an analyst.
-Here is analyst area of focus:{goals}.
-Your goal is to answer a question posed by the interviewer.
-To answer question, use this context: {context}
-When answering questions, follow these guidelines:
-1. Use only the information provided in the context.
-2. Do not introduce external information or make assumptions beyond what is explicitly stated in the context.
-3. The context contains sources at the topic of each individual document.
-4. Include these sources your answer next to any relevant statements. For example, for source # 1 use [1].
-5. List your sources in order at the bottom of your answer. [1] Source 1, [2] Source 2, etc
-6. If the source is: <Document source="assistant/docs/llama3_1.pdf" page="7"/>' then just list:[1] assistant/docs/llama3_1.pdf, page 7 
-And skip the addition of the brackets as well as the Document source preamble in your citation.
-"""
-
-def generate_answer(state:InterviewState):
-    print("generate_answer")
+async def tavily_results(tavily_search, query:str) -> list:
+    # TavilySearchResults.ainvoke returns failures as a string; its API wrapper raises them, so they are retried
+    try:
+        raw_results = await tavily_search.api_wrapper.raw_results_async(
+            query, max_results=tavily_search.max_results, search_depth=tavily_search.search_depth,
+            include_domains=tavily_search.include_domains, exclude_domains=tavily_search.exclude_domains,
+            include_answer=tavily_search.include_answer, include_raw_content=tavily_search.include_raw_content,
+            include_images=tavily_search.include_images,
+        )
+    except Exception as e:
+        if rate_limit.status_code(e) is not None or rate_limit.is_retryable(e):
+            raise
+        raise rate_limit.ProviderError.from_error(e) from e
+    return tavily_search.api_wrapper.clean_results(raw_results["results"])
+
+async def fetch_web(query:str):
+    tavily_search = get_tavily_search()
+    async def search():
+        start = time.perf_counter()
+        results = await tavily_results(tavily_search, query)
+        instrumentation.record_search(time.perf_counter() - start)
+        return results
+    async def load():
+        return await concurrency.call("tavily", search)
+    params = {"max_results":tavily_search.max_results}
+    key = ("tavily", retrieval_cache.normalize_query(query), tuple(params.items()))
+    return await searches.do(key, lambda: get_search_cache().afetch("tavily", query, load, params=params))
+
+async def fetch_wikipedia(query:str):
+    def load():
+        docs = get_wikipedia_loader()(query=query, load_max_docs=2).load()
+        return [{"page_content":doc.page_content, "metadata":doc.metadata} for doc in docs]
+    async def aload():
+        start = time.perf_counter()
+        results = await concurrency.to_thread("wikipedia", load)
+        instrumentation.record_search(time.perf_counter() - start)
+        return results
+    params = {"load_max_docs":2}
+    key = ("wikipedia", retrieval_cache.normalize_query(query), tuple(params.items()))
+    return await searches.do(key, lambda: get_search_cache().afetch("wikipedia", query, aload, params=params))
+
+
+# Write the query once per turn and share it between every search backend
+async def plan_query(state:InterviewState):
+    search_query = await invoke_llm("plan_query", [search_instructions]+conversation_memory.prompt_messages(state), schema=SearchQuery)
+    return {"search_query":search_query.search_query}
+
+async def bounded_search(fetch, query:str):
+    # A search that outlives its budget is skipped (None); the answer uses the context that already arrived
+    try:
+        return await timeouts.bounded(fetch(query), timeouts.search_timeout())
+    except asyncio.TimeoutError:
+        instrumentation.record_timeout()
+        return None
+
+async def search_web(state:InterviewState):
+
+    search_docs = await bounded_search(fetch_web, state["search_query"])
+    turn = count_answers(state["messages"])
+
+    return {"context":[context_builder.web_document(doc, turn) for doc in search_docs or []], "degraded":search_docs is None}
+
+async def search_wikipedia(state:InterviewState):
+
+    search_docs = await bounded_search(fetch_wikipedia, state["search_query"])
+    turn = count_answers(state["messages"])
+
+    return {"context":[context_builder.wikipedia_document(doc, turn) for doc in search_docs or []], "degraded":search_docs is None}
+
+
+async def generate_answer(state:InterviewState):
     customer = state["customer"]
     messages = state["messages"]
-    context = state["context"]
+    token_budget = state.get("context_token_budget", context_builder.DEFAULT_TOKEN_BUDGET)
+    top_k = state.get("passage_top_k", context_builder.DEFAULT_TOP_K)
+    context = context_builder.assemble(state["context"], query=messages[-1].content, token_budget=token_budget, top_k=top_k)
 
     system_message = answer_instructions.format(goals= customer.persona, context=context)
-    answer = llm.invoke([SystemMessage(content=system_message)]+messages)
+    answer = await invoke_llm("generate_answer", [SystemMessage(content=system_message)]+conversation_memory.prompt_messages(state), customer_config(customer))
 
     answer.name = "customer"
 
     return{"messages":[answer]}
 
 
-from langchain_core.messages import get_buffer_string
+# LLM and search calls of one interview turn: question, search query, answer; web and Wikipedia
+LLM_CALLS_PER_TURN = 3
+SEARCH_CALLS_PER_TURN = 2
 
 def save_interview(state: InterviewState):
-    print("save_interview")
     messages = state["messages"]
     interview = get_buffer_string(messages)
+    # Report the turns skipped when the interview ended early for lack of new information
+    turns_saved = max(state.get('max_num_turns',2) - count_answers(messages), 0)
+    if turns_saved and "Thank you so much for your help!" not in messages[-2].content:
+        instrumentation.record_saved(turns_saved, turns_saved * LLM_CALLS_PER_TURN, turns_saved * SEARCH_CALLS_PER_TURN)
     return {"interview":interview}
 
 
+def count_answers(messages, name:str="customer") -> int:
+    return len([m for m in messages if isinstance(m, AIMessage) and m.name == name])
+
 def route_messages (state:InterviewState, name:str="customer"):
-    print("route_messages")
     messages = state["messages"]
     max_num_turns= state.get('max_num_turns',2)
 
-    num_responses = len([m for m in messages if isinstance(m, AIMessage) and m.name == name])
-    print(num_responses)
+    num_responses = count_answers(messages, name)
     if num_responses >= max_num_turns:
         return 'save_interview'
     
@@ -203,175 +336,192 @@ def route_messages (state:InterviewState, name:str="customer"):
 
     if "Thank you so much for your help!" in last_question.content:
         return "save_interview"
+    if novelty.should_stop(state, name):
+        return "save_interview"
+    if state.get("memory_strategy", conversation_memory.DEFAULT_STRATEGY) == "summary":
+        return "compress_history"
     return "ask_question"
 
-#write review
-section_writer_instructions = """ 
-You are an expert technical writer.
-Your task is to create a short, easily digestible section of a report based on a set of source documents.
-1. Analyze the content of the source documents:
-- The name of each source document is at the start of the document, with the <Document tag.
-2. Create a report structure using markdoen formatting:
-- Use ## for the section title
-- Use ### for sub-section headers
-3. Write the report following this structure:
-a. Title (## header)
-b. Summary (### header)
-c. Sources (### header)
-4. Make your title engaging based upon the focus area of the analyst: 
-{focus}
-5. For the summary section:
-- Set up summary with general background / context related to the focus area of the analyst
-- Emphasize what is novel, interesting, or surprising about insights gathered from the interview
-- Create a numbered list of source documents, as you use them
-- Do not mention the names of interviewers or experts
-- Aim for approximately 400 words maximum
-- Use numbered sources in your report (e.g., [1], [2]) based on information from source documents
-6. In the Sources section:
-- Include all sources used in your report
-- Provide full links to relevant websites or specific document paths
-- Separate each source by a newline. Use two spaces at the end of each line to create a newline in Markdown.
-- It will look like:
-
-### Sources
-[1] Link or Document name
-[2] Link or Document name
-
-7. Be sure to combine sources. For example this is not correct:
-
-[3] https://ai.meta.com/blog/meta-llama-3-1/
-[4] https://ai.meta.com/blog/meta-llama-3-1/
-
-There should be no redundant sources. It should simply be:
-
-[3] https://ai.meta.com/blog/meta-llama-3-1/
-        
-8. Final review:
-- Ensure the report follows the required structure
-- Include no preamble before the title of the report
-- Check that all guidelines have been followed
-"""
-
-def write_section(state:InterviewState):
-    print("write_section")
+async def compress_history(state:InterviewState):
+    # Fold older turns into the running summary once the conversation outgrows its token threshold
+    folded = conversation_memory.messages_to_fold(state)
+    if not folded:
+        return {}
+    customer = state["customer"]
+    system_message = summary_instructions.format(summary=state.get("summary") or "(empty)")
+    summary = await invoke_llm("compress_history", [SystemMessage(content=system_message)]+[HumanMessage(content=get_buffer_string(folded))], customer_config(customer))
+    return {"summary":summary.content, "summarized":state.get("summarized", 0) + len(folded)}
+
+
+async def write_section(state:InterviewState):
     interview = state["interview"]
-    context=state["context"]
     customer=state["customer"]
+    token_budget = state.get("context_token_budget", context_builder.DEFAULT_TOKEN_BUDGET)
+    top_k = state.get("passage_top_k", context_builder.DEFAULT_TOP_K)
+    context = context_builder.assemble(state["context"], query=customer.description, token_budget=token_budget, top_k=top_k)
 
     system_message = section_writer_instructions.format(focus=customer.description)
-    section = llm.invoke([SystemMessage(content=system_message)]+ [HumanMessage(content=f"Use this source to write your section: {context}")])
-
-    return {"sections":[section.content]}
-
-interview_builder = StateGraph(InterviewState)
-interview_builder.add_node("ask_question", generate_question)
-interview_builder.add_node("search_web", search_web)
-interview_builder.add_node("search_wikipedia", search_wikipedia)
-interview_builder.add_node("answer_question", generate_answer)
-interview_builder.add_node("save_interview", save_interview)
-interview_builder.add_node("write_section",write_section)
+    section = await invoke_llm("write_section", [SystemMessage(content=system_message)]+ [HumanMessage(content=f"Use this source to write your section: {context}")], customer_config(customer))
+
+    # Sections carry the records of the sources they cite, for numbering in finalize_report
+    record = {"content":section.content, "sources":citations.cited_sources(section.content, state["context"])}
+    # A section written without the results of a timed-out search is not reused by later runs
+    if "topic" in state and not state.get("degraded"):
+        settings = {key:state[key] for key in interview_settings if key in state}
+        get_section_cache().set(customer, state["topic"], record, settings, resolved_section_routes())
+
+    return {"sections":[record]}
+
+interview_builder = StateGraph(InterviewState, output_schema=InterviewOutputState)
+interview_builder.add_node("ask_question", instrumentation.instrument("ask_question")(timeouts.budget("ask_question")(generate_question)))
+interview_builder.add_node("plan_query", instrumentation.instrument("plan_query")(timeouts.budget("plan_query")(plan_query)))
+interview_builder.add_node("search_web", instrumentation.instrument("search_web")(search_web))
+interview_builder.add_node("search_wikipedia", instrumentation.instrument("search_wikipedia")(search_wikipedia))
+interview_builder.add_node("answer_question", instrumentation.instrument("answer_question")(timeouts.budget("answer_question")(generate_answer)))
+interview_builder.add_node("compress_history", instrumentation.instrument("compress_history")(timeouts.budget("compress_history")(compress_history)))
+interview_builder.add_node("save_interview", instrumentation.instrument("save_interview")(save_interview))
+interview_builder.add_node("write_section", instrumentation.instrument("write_section")(timeouts.budget("write_section")(write_section)))
 
 interview_builder.add_edge(START, "ask_question")
-interview_builder.add_edge("ask_question", "search_web")
-interview_builder.add_edge("ask_question", "search_wikipedia")
+interview_builder.add_edge("ask_question", "plan_query")
+interview_builder.add_edge("plan_query", "search_web")
+interview_builder.add_edge("plan_query", "search_wikipedia")
 interview_builder.add_edge("search_web", "answer_question")
 interview_builder.add_edge("search_wikipedia", "answer_question")
-interview_builder.add_conditional_edges("answer_question", route_messages, ['ask_question', "save_interview"])
+interview_builder.add_conditional_edges("answer_question", route_messages, ['ask_question', 'compress_history', "save_interview"])
+interview_builder.add_edge("compress_history", "ask_question")
 interview_builder.add_edge("save_interview", "write_section")
 interview_builder.add_edge("write_section", END)
+interview_graph = interview_builder.compile()
 
-class ResearchGraphState(TypedDict):
-    topic:str
-    max_customers:int
-    human_analyst_feedback:str
-    customers:List[Customer]
-    sections: Annotated[list, operator.add]
-    content:str
-    final_report: str
+async def conduct_interview(state:InterviewState, config):
+    # Interviews still running at the run deadline are dropped instead of holding up the report
+    try:
+        interview = await timeouts.bounded(interview_graph.ainvoke(state, config))
+    except asyncio.TimeoutError:
+        return {"dropped":[state["customer"].name]}
+    return {"sections":interview["sections"]}
 
 
-def inititate_all_interviews(state:ResearchGraphState):
+def route_feedback(state:ResearchGraphState):
     human_analyst_feedback = state.get('human_analyst_feedback')
     if human_analyst_feedback:
         return "create_customers"
-    else:
-        topic=state["topic"]
-        return [Send("conduct_interview",{"customer":customer,"messages":[HumanMessage(content=f"So you said you were writing an article on {topic}?")]})for customer in state["customers"]]
-
-#writing final report
-report_writer_instructions = """You are a technical writer creating a report on this overall topic: 
-
-{topic}
-    
-You have a team of analysts. Each analyst has done two things: 
+    return "prefetch_background"
 
-1. They conducted an interview with an expert on a specific sub-topic.
-2. They write up their finding into a memo.
-
-Your task: 
-
-1. You will be given a collection of memos from your analysts.
-2. Think carefully about the insights from each memo.
-3. Consolidate these into a crisp overall summary that ties together the central ideas from all of the memos. 
-4. Summarize the central points in each memo into a cohesive single narrative.
-
-To format your report:
- 
-1. Use markdown formatting. 
-2. Include no pre-amble for the report.
-3. Use no sub-heading. 
-4. Start your report with a single title header: ## Insights
-5. Do not mention any analyst names in your report.
-6. Preserve any citations in the memos, which will be annotated in brackets, for example [1] or [2].
-7. Create a final, consolidated list of sources and add to a Sources section with the `## Sources` header.
-8. List your sources in order and do not repeat.
-
-[1] Source 1
-[2] Source 2
-
-Here are the memos from your analysts to build your report from: 
-
-{context}"""
-
-def write_report(state:ResearchGraphState):
-    sections = state["sections"]
+async def prefetch_background(state:ResearchGraphState):
+    # Searches on the topic itself, run once and handed to every interview as starting context
+    if not state.get("prefetch_background", True):
+        return {"background":[]}
     topic = state["topic"]
-    formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
+    web_docs, wikipedia_docs = await asyncio.gather(bounded_search(fetch_web, topic), bounded_search(fetch_wikipedia, topic))
+    # Turn -1: retrieved before the first question of any interview
+    background = [context_builder.web_document(doc, -1) for doc in web_docs or []] + [context_builder.wikipedia_document(doc, -1) for doc in wikipedia_docs or []]
+    return {"background":background}
+
+def inititate_all_interviews(state:ResearchGraphState):
+    topic=state["topic"]
+    settings = {key:state[key] for key in interview_settings if key in state}
+    customers = state["customers"]
+    background = state.get("background", [])
+    fan_in = report_fan_in(state)
+    if len(customers) <= fan_in:
+        return interview_sends(topic, customers, settings, background)
+    # Each group merges its own sections as soon as its interviews are done
+    return [Send("report_group", {"topic":topic, "customers":customers[i:i + fan_in], "background":background, **settings}) for i in range(0, len(customers), fan_in)]
+
+def interview_sends(topic:str, customers:List[Customer], settings:dict, background:list) -> list:
+    store = get_section_cache()
+    routes = resolved_section_routes()
+    sends = []
+    for customer in customers:
+        section = store.get(customer, topic, settings, routes)
+        if section is not None:
+            sends.append(Send("reuse_section", {"sections":[section]}))
+        else:
+            sends.append(Send("conduct_interview",{"customer":customer,"messages":[HumanMessage(content=f"So you said you were writing an article on {topic}?")], "topic":topic, "context":background, **settings}))
+    return sends
+
+def reuse_section(state:ResearchGraphState):
+    return {"sections":state["sections"]}
+
+DEFAULT_REPORT_FAN_IN = 8
+
+def report_fan_in(state) -> int:
+    return max(state.get("report_fan_in", DEFAULT_REPORT_FAN_IN), 2)
+
+async def merge_memos(topic:str, memos:list) -> dict:
+    formatted_str_sections = "\n\n".join([memo["content"] for memo in memos])
     system_message = report_writer_instructions.format(topic=topic,context=formatted_str_sections)
-    report = llm.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")])
-    return {"content":report.content}
+    report = await invoke_llm("write_report", [SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")])
+    return {"content":report.content, "sources":citations.merge_sources(*(memo["sources"] for memo in memos))}
+
+def start_group_interviews(state:ReportGroupState):
+    settings = {key:state[key] for key in interview_settings if key in state}
+    return interview_sends(state["topic"], state["customers"], settings, state.get("background", []))
+
+async def merge_group(state:ReportGroupState):
+    sections = state.get("sections", [])
+    if len(sections) <= 1:
+        return {"partials":sections}
+    return {"partials":[await merge_memos(state["topic"], sections)]}
+
+group_builder = StateGraph(ReportGroupState, output_schema=ReportGroupOutputState)
+group_builder.add_node("conduct_interview", conduct_interview)
+group_builder.add_node("reuse_section", instrumentation.instrument("reuse_section")(reuse_section))
+group_builder.add_node("merge_group", instrumentation.instrument("merge_group")(timeouts.budget("merge_group", report=True)(merge_group)))
+group_builder.add_conditional_edges(START, start_group_interviews, ["conduct_interview", "reuse_section"])
+group_builder.add_edge("conduct_interview", "merge_group")
+group_builder.add_edge("reuse_section", "merge_group")
+group_builder.add_edge("merge_group", END)
+
+
+async def write_report(state:ResearchGraphState):
+    # Merge at most report_fan_in memos per call, level by level, then write the final report
+    memos = state.get("partials") or state["sections"]
+    topic = state["topic"]
+    if not memos:
+        return {"content":"", "sources":[]}
+    fan_in = report_fan_in(state)
+    while len(memos) > fan_in:
+        memos = await asyncio.gather(*(merge_memos(topic, memos[i:i + fan_in]) for i in range(0, len(memos), fan_in)))
+    report = await merge_memos(topic, memos)
+    return {"content":report["content"], "sources":report["sources"]}
 
 def finalize_report(state:ResearchGraphState):
-    content = state["content"]
-    if content.startswith("## Insights"):
-        content = content.strip("## Insights")
-    if "## Sources" in content:
-        try:
-            content, sources = content.split("\n## Sources\n")
-        except:
-            sources = None
-    else:
-        sources = None
-    final_report = content
-    if sources is not None:
-        final_report += "\n\n## Sources\n" + sources
-    return {"final_report": final_report}
+    # Number the cited sources in order of appearance and list them under ## Sources
+    dropped = state.get("dropped", [])
+    note = f"*Not included: customers whose interviews did not finish before the deadline ({', '.join(dropped)}).*" if dropped else ""
+    return {"final_report":citations.render(state["content"], state.get("sources", []), note)}
 
 builder = StateGraph(ResearchGraphState)
-builder.add_node("create_customers", create_customers)
-builder.add_node("human_feedback",human_feedback)
-builder.add_node("conduct_interview", interview_builder.compile())
-builder.add_node("write_report",write_report)
-builder.add_node("finalize_report",finalize_report)
+builder.add_node("create_customers", instrumentation.instrument("create_customers")(timeouts.budget("create_customers")(create_customers)))
+builder.add_node("human_feedback", instrumentation.instrument("human_feedback")(human_feedback))
+builder.add_node("prefetch_background", instrumentation.instrument("prefetch_background")(prefetch_background))
+builder.add_node("conduct_interview", conduct_interview)
+builder.add_node("reuse_section", instrumentation.instrument("reuse_section")(reuse_section))
+builder.add_node("report_group", group_builder.compile())
+builder.add_node("write_report", instrumentation.instrument("write_report")(timeouts.budget("write_report", report=True)(write_report)))
+builder.add_node("finalize_report", instrumentation.instrument("finalize_report")(finalize_report))
 
 builder.add_edge(START, "create_customers")
 builder.add_edge("create_customers", "human_feedback")
-builder.add_conditional_edges("human_feedback", inititate_all_interviews,["create_customers","conduct_interview"])
+builder.add_conditional_edges("human_feedback", route_feedback, ["create_customers","prefetch_background"])
+builder.add_conditional_edges("prefetch_background", inititate_all_interviews, ["conduct_interview","reuse_section","report_group"])
 builder.add_edge("conduct_interview","write_report")
+builder.add_edge("reuse_section","write_report")
+builder.add_edge("report_group","write_report")
 builder.add_edge("write_report","finalize_report")
 builder.add_edge("finalize_report",END)
 
-memory = MemorySaver()
-graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=memory)
+def __getattr__(name):
+    # The checkpointer may open a database, so the graph is compiled on first access
+    global graph
+    if name == "graph":
+        import checkpoint
+        load_env()
+        graph = builder.compile(interrupt_before=['human_feedback'], checkpointer=checkpoint.from_env())
+        return graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
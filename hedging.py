@@ -0,0 +1,170 @@
+# Hedged LLM requests against tail latency.
+#
+# Latencies of LLM calls are tracked per graph node. With LLM_HEDGE_PERCENTILE set, a call
+# still running after that percentile of its node's recent latencies is raced against a
+# duplicate request, sent to the fallback model when one is registered for the runnable
+# (see models); the first answer wins and the other request is cancelled.
+import asyncio
+import bisect
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+import instrumentation
+
+HISTOGRAM_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_MIN_DELAY = 1.0
+
+class LatencyTracker:
+    """Recent latencies per key for percentiles, and cumulative histograms for metrics."""
+
+    def __init__(self, window:int=200):
+        self.recent = defaultdict(lambda: deque(maxlen=window))
+        self.buckets = defaultdict(lambda: [0] * (len(HISTOGRAM_BUCKETS) + 1))
+        self.sums = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, key:str, seconds:float):
+        with self._lock:
+            self.recent[key].append(seconds)
+            self.buckets[key][bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+            self.sums[key] += seconds
+
+    def samples(self, key:str) -> int:
+        return len(self.recent[key])
+
+    def percentile(self, key:str, percentile:float):
+        with self._lock:
+            values = sorted(self.recent[key])
+        if not values:
+            return None
+        return values[min(int(len(values) * percentile / 100), len(values) - 1)]
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP content_creator_llm_latency_seconds Latency of LLM calls as seen by the caller, hedges included",
+            "# TYPE content_creator_llm_latency_seconds histogram",
+        ]
+        with self._lock:
+            for key, counts in sorted(self.buckets.items()):
+                total = 0
+                for bound, count in zip(HISTOGRAM_BUCKETS + ("+Inf",), counts):
+                    total += count
+                    lines.append(f'content_creator_llm_latency_seconds_bucket{{node="{key}",le="{bound}"}} {total}')
+                lines.append(f'content_creator_llm_latency_seconds_sum{{node="{key}"}} {self.sums[key]}')
+                lines.append(f'content_creator_llm_latency_seconds_count{{node="{key}"}} {total}')
+        return "\n".join(lines) + "\n"
+
+class Hedger:
+    def __init__(self, percentile:float=None, min_samples:int=DEFAULT_MIN_SAMPLES, min_delay:float=DEFAULT_MIN_DELAY):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = LatencyTracker()
+        self.calls = Counter()
+        self.hedged = Counter()
+        self.hedge_wins = Counter()
+        # id(runnable) -> (runnable, fallback); chat models are pydantic models and not hashable
+        self._fallbacks = {}
+
+    def set_fallback(self, runnable, fallback):
+        # Duplicates of calls to `runnable` go to `fallback` instead of repeating the same request
+        self._fallbacks[id(runnable)] = (runnable, fallback)
+
+    def fallback_for(self, runnable):
+        entry = self._fallbacks.get(id(runnable))
+        return entry[1] if entry and entry[0] is runnable else runnable
+
+    def hedge_delay(self, key:str):
+        if not self.percentile or self.latencies.samples(key) < self.min_samples:
+            return None
+        return max(self.latencies.percentile(key, self.percentile), self.min_delay)
+
+    async def call(self, primary, hedge, key:str=None, started:asyncio.Event=None):
+        """Await `primary()`; if it is slower than the hedge delay, race it against `hedge()`.
+
+        `started` is set once the primary streams its first token. Its output is then being
+        shown, so it is not hedged, and a race already under way is settled in its favour.
+        """
+        key = key or instrumentation.current_node() or "other"
+        self.calls[key] += 1
+        start = time.monotonic()
+        delay = self.hedge_delay(key)
+        if delay is None:
+            result = await primary()
+            self.latencies.observe(key, time.monotonic() - start)
+            return result
+
+        first = asyncio.ensure_future(primary())
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if not done and started is not None and started.is_set():
+                done, _ = await asyncio.wait({first})
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done:
+            self.latencies.observe(key, time.monotonic() - start)
+            return first.result()
+
+        self.hedged[key] += 1
+        second = asyncio.ensure_future(hedge())
+        pending = {first, second}
+        watch = {asyncio.ensure_future(started.wait())} if started is not None else set()
+        tasks = [first, second, *watch]
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending | watch, return_when=asyncio.FIRST_COMPLETED)
+                if done & watch:
+                    # The primary started streaming before the duplicate answered
+                    watch = set()
+                    pending.discard(second)
+                    second.cancel()
+                for task in done & pending:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        won = task is second
+                        self.hedge_wins[key] += won
+                        instrumentation.record_hedge(won)
+                        self.latencies.observe(key, time.monotonic() - start)
+                        return task.result()
+            # Both failed (or the primary failed after it started streaming): raise the original request's error
+            instrumentation.record_hedge(False)
+            if not second.cancelled():
+                second.exception()
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            key:{"calls":self.calls[key], "hedged":self.hedged[key], "hedge_wins":self.hedge_wins[key]}
+            for key in sorted(self.calls)
+        }
+
+def from_env() -> Hedger:
+    # LLM_HEDGE_PERCENTILE=95 hedges calls slower than their node's recent p95; unset disables hedging
+    percentile = os.environ.get("LLM_HEDGE_PERCENTILE")
+    return Hedger(
+        percentile=float(percentile) if percentile else None,
+        min_samples=int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", DEFAULT_MIN_SAMPLES)),
+        min_delay=float(os.environ.get("LLM_HEDGE_MIN_DELAY", DEFAULT_MIN_DELAY)),
+    )
+
+hedger = None
+_lock = threading.Lock()
+
+def get() -> Hedger:
+    global hedger
+    with _lock:
+        if hedger is None:
+            hedger = from_env()
+        return hedger
+
+def reset(new:Hedger=None):
+    global hedger
+    with _lock:
+        hedger = new
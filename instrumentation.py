@@ -0,0 +1,224 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langgraph.config import get_config
+
+# The most recent node invocations, in completion order; the per-node totals behind
+# summary() and the Prometheus counters cover every invocation of the process
+MAX_RECORDS = 10000
+records = deque(maxlen=MAX_RECORDS)
+totals = defaultdict(lambda: {"calls":0, "seconds":0.0, "max_seconds":0.0, "prompt_tokens":0, "completion_tokens":0, "search_seconds":0.0, "retries":0, "timeouts":0, "hedges":0, "hedge_wins":0, "turns_saved":0, "errors":0})
+_lock = threading.Lock()
+_current = contextvars.ContextVar("instrumentation_record", default=None)
+
+def _labels(state) -> dict:
+    try:
+        thread_id = get_config()["configurable"].get("thread_id")
+    except RuntimeError:
+        thread_id = None
+    customer = state.get("customer") if isinstance(state, dict) else None
+    messages = state.get("messages") if isinstance(state, dict) else None
+    turn = len([m for m in messages if getattr(m, "name", None) == "customer"]) if messages else None
+    return {"thread_id":thread_id, "customer":customer.name if customer else None, "turn":turn}
+
+def _result_size(result) -> int:
+    if not result:
+        return 0
+    return len(json.dumps(result, default=str))
+
+def _new_record(node:str, state) -> dict:
+    return {
+        "node":node,
+        **_labels(state),
+        "started_at":time.time(),
+        "seconds":0.0,
+        "llm_calls":0,
+        "prompt_tokens":0,
+        "completion_tokens":0,
+        "search_calls":0,
+        "search_seconds":0.0,
+        "retries":0,
+        "timeouts":0,
+        "hedges":0,
+        "hedge_wins":0,
+        "turns_saved":0,
+        "llm_calls_saved":0,
+        "search_calls_saved":0,
+        "result_size":0,
+        "error":None,
+    }
+
+def _finish(record:dict, start:float):
+    record["seconds"] = time.perf_counter() - start
+    with _lock:
+        records.append(record)
+        _add(totals[record["node"]], record)
+    path = os.environ.get("METRICS_JSONL")
+    if path:
+        with _lock, open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+def instrument(node:str):
+    """Record wall time, LLM tokens, search latency and result size of every call to a graph node."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(state):
+                record = _new_record(node, state)
+                token = _current.set(record)
+                start = time.perf_counter()
+                try:
+                    result = await func(state)
+                    record["result_size"] = _result_size(result)
+                    return result
+                except Exception as e:
+                    record["error"] = type(e).__name__
+                    raise
+                finally:
+                    _current.reset(token)
+                    _finish(record, start)
+        else:
+            @functools.wraps(func)
+            def wrapper(state):
+                record = _new_record(node, state)
+                token = _current.set(record)
+                start = time.perf_counter()
+                try:
+                    result = func(state)
+                    record["result_size"] = _result_size(result)
+                    return result
+                except Exception as e:
+                    record["error"] = type(e).__name__
+                    raise
+                finally:
+                    _current.reset(token)
+                    _finish(record, start)
+        return wrapper
+    return decorator
+
+def record_search(seconds:float):
+    record = _current.get()
+    if record is not None:
+        record["search_calls"] += 1
+        record["search_seconds"] += seconds
+
+def record_saved(turns:int, llm_calls:int, search_calls:int):
+    # Interview turns, and the calls they would have made, skipped by stopping early
+    record = _current.get()
+    if record is not None:
+        record["turns_saved"] += turns
+        record["llm_calls_saved"] += llm_calls
+        record["search_calls_saved"] += search_calls
+
+def record_timeout():
+    record = _current.get()
+    if record is not None:
+        record["timeouts"] += 1
+
+def record_hedge(won:bool):
+    # An LLM call raced against a duplicate request; `won` when the duplicate answered first
+    record = _current.get()
+    if record is not None:
+        record["hedges"] += 1
+        record["hedge_wins"] += won
+
+def current_node() -> str:
+    record = _current.get()
+    return record["node"] if record is not None else None
+
+def record_retry():
+    record = _current.get()
+    if record is not None:
+        record["retries"] += 1
+
+class UsageHandler(AsyncCallbackHandler):
+    # Adds token usage of every chat model run to the record of the node that made it
+    async def on_llm_end(self, response, **kwargs):
+        record = _current.get()
+        if record is None:
+            return
+        record["llm_calls"] += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    record["prompt_tokens"] += usage.get("input_tokens", 0)
+                    record["completion_tokens"] += usage.get("output_tokens", 0)
+
+    async def on_retry(self, retry_state, **kwargs):
+        record_retry()
+
+usage_handler = UsageHandler()
+
+def reset():
+    with _lock:
+        records.clear()
+        totals.clear()
+
+def export_jsonl(path:str):
+    with _lock, open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+def _add(row:dict, record:dict):
+    row["calls"] += 1
+    row["seconds"] += record["seconds"]
+    row["max_seconds"] = max(row["max_seconds"], record["seconds"])
+    for key in ("prompt_tokens", "completion_tokens", "search_seconds", "retries", "timeouts", "hedges", "hedge_wins", "turns_saved"):
+        row[key] += record[key]
+    row["errors"] += record["error"] is not None
+
+def summary() -> list:
+    with _lock:
+        return [{"node":node, **row} for node, row in totals.items()]
+
+def prometheus_text() -> str:
+    metrics = [
+        ("node_invocations_total", "counter", "Graph node invocations", "calls"),
+        ("node_seconds_total", "counter", "Wall time spent in graph nodes", "seconds"),
+        ("llm_prompt_tokens_total", "counter", "LLM prompt tokens", "prompt_tokens"),
+        ("llm_completion_tokens_total", "counter", "LLM completion tokens", "completion_tokens"),
+        ("search_seconds_total", "counter", "Time spent waiting on search backends", "search_seconds"),
+        ("retries_total", "counter", "Retried calls", "retries"),
+        ("timeouts_total", "counter", "Searches given up on after their time budget", "timeouts"),
+        ("llm_hedges_total", "counter", "LLM calls raced against a duplicate request", "hedges"),
+        ("llm_hedge_wins_total", "counter", "Hedged LLM calls answered first by the duplicate", "hedge_wins"),
+        ("interview_turns_saved_total", "counter", "Interview turns skipped by stopping early", "turns_saved"),
+        ("node_errors_total", "counter", "Graph node invocations that raised", "errors"),
+    ]
+    rows = summary()
+    lines = []
+    for name, kind, help, key in metrics:
+        lines.append(f"# HELP content_creator_{name} {help}")
+        lines.append(f"# TYPE content_creator_{name} {kind}")
+        for row in rows:
+            lines.append(f'content_creator_{name}{{node="{row["node"]}"}} {row[key]}')
+    import hedging
+    return "\n".join(lines) + "\n" + hedging.get().latencies.prometheus_text()
+
+def summary_table() -> str:
+    header = f"{'node':<20}{'calls':>7}{'total s':>10}{'max s':>9}{'prompt tok':>12}{'compl tok':>11}{'search s':>10}{'retries':>9}"
+    lines = [header, "-" * len(header)]
+    for row in sorted(summary(), key=lambda row: row["seconds"], reverse=True):
+        lines.append(
+            f"{row['node']:<20}{row['calls']:>7}{row['seconds']:>10.2f}{row['max_seconds']:>9.2f}"
+            f"{row['prompt_tokens']:>12}{row['completion_tokens']:>11}{row['search_seconds']:>10.2f}{row['retries']:>9}"
+        )
+    with _lock:
+        stopped = [record for record in records if record["turns_saved"]]
+    if stopped:
+        lines.append("")
+        lines.append("Interviews stopped early:")
+    for record in stopped:
+        lines.append(
+            f"  {record['customer']}: {record['turn']} turns, saved {record['turns_saved']} turns "
+            f"({record['llm_calls_saved']} LLM calls, {record['search_calls_saved']} searches)"
+        )
+    return "\n".join(lines)
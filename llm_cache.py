@@ -0,0 +1,93 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+class SQLiteLLMCache(BaseCache):
+    """Content-addressed cache of chat model responses.
+
+    LangChain hands every lookup the serialized messages (`prompt`) and a string
+    describing the model, its parameters and any bound tools or structured-output
+    schema (`llm_string`). Entries are keyed by a hash of both and the least
+    recently used ones are evicted once the store exceeds `max_bytes`.
+    """
+
+    def __init__(self, path:str=".cache/llm.sqlite", max_bytes:int=DEFAULT_MAX_BYTES):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS generations_accessed_at ON generations (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(prompt:str, llm_string:str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt:str, llm_string:str):
+        key = self.key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE generations SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return loads(row[0], allowed_objects="core")
+
+    def update(self, prompt:str, llm_string:str, return_val):
+        key = self.key(prompt, llm_string)
+        data = dumps(return_val)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?)",
+                (key, data, len(data.encode()), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM generations")
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM generations ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM generations WHERE key = ?", evicted)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+def from_env():
+    # Opt-in: responses are only cached when LLM_CACHE_PATH is set
+    path = os.environ.get("LLM_CACHE_PATH")
+    if not path:
+        return None
+    return SQLiteLLMCache(path=path, max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
@@ -1,48 +1,103 @@
-from finalize import graph
+import argparse
+import asyncio
+import os
+import time
+import instrumentation
+import models
+import finalize
 
 #input
 max_customers = 3
 topic = "Write a comment about the latest iphone 17"
-thread = {"configurable":{"thread_id":"1"}}
+stream_tokens = True # Print LLM tokens as they are generated
 
-for event in graph.stream({"topic":topic, "max_customers":max_customers}, thread, stream_mode="values"):
+# Nodes whose LLM output is streamed to the terminal
+streamed_nodes = {"answer_question", "write_section", "write_report"}
+
+def print_customers(event):
     customers = event.get('customers','')
     if customers:
-        for c in customers:
-            print(f"Name: {c.name}")
+        for i, c in enumerate(customers, 1):
+            print(f"{i}. Name: {c.name}")
             print(f"Occupation: {c.occupation}")
             print(f"Age: {c.age}")
             print(f"Description: {c.description}")
             print("-"*50)
 
-state = graph.get_state(thread)
-# print(state)
-while True:
-    user_approval = input("Do you want to revise the customers? (yes/no)")
-
-    if user_approval.lower() == "yes":
-        feedback = input("provide feedback: ")
-        graph.update_state(thread, {"human_analyst_feedback":feedback}, as_node="human_feedback")
-        # state = graph.get_state(thread)
-        # print(state)
-        for event in graph.stream(None, thread, stream_mode="values"):
-            customers = event.get('customers','')
-            if customers:
-                for c in customers:
-                    print(f"Name: {c.name}")
-                    print(f"Occupation: {c.occupation}")
-                    print(f"Age: {c.age}")
-                    print(f"Description: {c.description}")
-                    print("-"*50)
-    if user_approval.lower() == 'no':
-        graph.update_state(thread, {"human_analyst_feedback":None}, as_node="human_feedback")
-        break
-
-for event in graph.stream(None, thread, stream_mode="updates"):
-    print("--Node--")
-    node_name = next(iter(event.keys()))
-    print(node_name)
-
-final_state = graph.get_state(thread)
-final_report= final_state.values.get("final_report")
-print(final_report)
\ No newline at end of file
+async def main(thread_id:str, resume:bool, metrics_dir:str, deadline:float=None):
+    # Compiled on first access (it may open CHECKPOINT_DB), not when this module is imported
+    graph = finalize.graph
+    thread = {"configurable":{"thread_id":thread_id}}
+
+    if resume:
+        # Completed nodes and interviews are restored from the checkpointer (set CHECKPOINT_DB)
+        state = await graph.aget_state(thread)
+        if not state.next:
+            print(f"Thread {thread_id} has nothing to resume")
+            return
+        print(f"Resuming thread {thread_id} at {', '.join(state.next)}")
+        print_customers(state.values)
+    else:
+        async for event in graph.astream({"topic":topic, "max_customers":max_customers}, thread, stream_mode="values"):
+            print_customers(event)
+        state = await graph.aget_state(thread)
+
+    while "human_feedback" in state.next:
+        user_approval = input("Do you want to revise the customers? (yes/no)")
+
+        if user_approval.lower() == "yes":
+            feedback = input("provide feedback (start a line with a customer number, e.g. '2: make them a student', to revise only that customer): ")
+            await graph.aupdate_state(thread, {"human_analyst_feedback":feedback}, as_node="human_feedback")
+            async for event in graph.astream(None, thread, stream_mode="values"):
+                print_customers(event)
+        if user_approval.lower() == 'no':
+            await graph.aupdate_state(thread, {"human_analyst_feedback":None}, as_node="human_feedback")
+            break
+
+    # Interviews run concurrently; MAX_INFLIGHT_CALLS caps the LLM and search calls in flight.
+    # Interviews still running `deadline` seconds from now are left out of the report
+    if deadline:
+        thread = {"configurable":{**thread["configurable"], "deadline":time.time() + deadline}}
+    final_report = None
+    source = None
+    stream_mode = ["updates", "messages"] if stream_tokens else ["updates"]
+    async for namespace, mode, event in graph.astream(None, thread, stream_mode=stream_mode, subgraphs=True):
+        if mode == "messages":
+            chunk, metadata = event
+            node_name = metadata.get("langgraph_node")
+            if node_name not in streamed_nodes or not chunk.content:
+                continue
+            # Tokens from concurrent interviews interleave, so label each switch of source
+            if source != (metadata.get("customer"), node_name):
+                source = (metadata.get("customer"), node_name)
+                print(f"\n\n[{source[0] or 'report'} | {node_name}]")
+            print(chunk.content, end="", flush=True)
+            continue
+        if namespace:
+            continue
+        print("\n--Node--")
+        node_name = next(iter(event.keys()))
+        print(node_name)
+        if node_name == "finalize_report":
+            final_report = event[node_name]["final_report"]
+
+    print(final_report)
+
+    print()
+    print(instrumentation.summary_table())
+    for model, row in models.get().costs().items():
+        print(f"{model}: {row['calls']} calls, {row['input_tokens']} prompt + {row['output_tokens']} completion tokens, ${row['usd']:.4f}")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        instrumentation.export_jsonl(os.path.join(metrics_dir, f"{thread_id}.jsonl"))
+        with open(os.path.join(metrics_dir, f"{thread_id}.prom"), "w") as f:
+            f.write(instrumentation.prometheus_text())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--thread-id", default="1")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run of --thread-id")
+    parser.add_argument("--metrics-dir", help="write per-node metrics as JSON lines and a Prometheus text snapshot")
+    parser.add_argument("--deadline", type=float, help="seconds the interviews may take once the customers are approved")
+    args = parser.parse_args()
+    asyncio.run(main(args.thread_id, args.resume, args.metrics_dir, args.deadline))
@@ -0,0 +1,188 @@
+# Which chat model each step of the graph runs on.
+#
+# Every step that calls an LLM asks for the model of its route: create_customers,
+# generate_question, plan_query, generate_answer, compress_history, write_section and
+# write_report. A route is a dict of ChatOpenAI settings,
+#
+#   {"model": "gpt-4o-mini", "max_tokens": 64, "timeout": 20}
+#   {"model": "llama3.1:8b", "base_url": "http://localhost:11434/v1", "api_key": "ollama"}
+#
+# plus optional "provider" (rate limit and timeout bucket, "local" for routes with a
+# base_url), "fallback" (model that slow calls are hedged to, see hedging: a model name,
+# run with the settings of the default route, or a route of its own such as
+# {"model": "gpt-4o-mini", "base_url": ...}) and "input_price"/"output_price" in USD per
+# million tokens. Routes start from "default"
+# and are overridden, in order, by MODEL_ROUTES (JSON, or the path of a JSON file),
+# MODEL_<ROUTE>=<model name> and {"configurable": {"models": {...}}} in the run config.
+import json
+import os
+import threading
+from collections import defaultdict
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langgraph.config import get_config
+
+import hedging
+import instrumentation
+
+ROUTES = ("create_customers", "generate_question", "plan_query", "generate_answer", "compress_history", "write_section", "write_report")
+DEFAULT_ROUTE = {"model":"gpt-4o", "temperature":0}
+# USD per million input and output tokens
+PRICES = {
+    "gpt-4o":(2.50, 10.00),
+    "gpt-4o-mini":(0.15, 0.60),
+    "gpt-4.1":(2.00, 8.00),
+    "gpt-4.1-mini":(0.40, 1.60),
+    "gpt-4.1-nano":(0.10, 0.40),
+}
+# Route keys that are not ChatOpenAI settings
+ROUTE_OPTIONS = ("provider", "fallback", "input_price", "output_price")
+# Settings that shape a route's output, which its hedge fallback keeps
+OUTPUT_OPTIONS = ("temperature", "max_tokens")
+
+def load_routes(value:str) -> dict:
+    if not value:
+        return {}
+    if not value.lstrip().startswith("{"):
+        with open(value) as f:
+            return json.load(f)
+    return json.loads(value)
+
+def env_routes() -> dict:
+    routes = load_routes(os.environ.get("MODEL_ROUTES"))
+    for name in ("default",) + ROUTES:
+        model = os.environ.get(f"MODEL_{name.upper()}")
+        if model:
+            routes[name] = {**routes.get(name, {}), "model":model}
+    fallback = os.environ.get("LLM_HEDGE_FALLBACK_MODEL")
+    if fallback:
+        routes["default"] = {"fallback":fallback, **routes.get("default", {})}
+    return routes
+
+def run_routes() -> dict:
+    try:
+        return get_config()["configurable"].get("models") or {}
+    except RuntimeError:
+        return {}
+
+def provider(route:dict) -> str:
+    return route.get("provider") or ("local" if route.get("base_url") else "openai")
+
+def price(route:dict) -> tuple:
+    default = PRICES.get(route["model"], (0.0, 0.0))
+    return route.get("input_price", default[0]), route.get("output_price", default[1])
+
+class ModelUsage(AsyncCallbackHandler):
+    # Counts the calls and tokens of one model, for costs per model
+    def __init__(self, usage:dict, model:str):
+        self.usage = usage
+        self.model = model
+
+    async def on_llm_end(self, response, **kwargs):
+        row = self.usage[self.model]
+        row["calls"] += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    row["input_tokens"] += usage.get("input_tokens", 0)
+                    row["output_tokens"] += usage.get("output_tokens", 0)
+
+def chat_openai(route:dict, callbacks:list, cache=None):
+    from langchain_openai import ChatOpenAI
+    settings = {key:value for key, value in route.items() if key not in ROUTE_OPTIONS}
+    # Retries are left to rate_limit, which backs off across all interviews at once
+    return ChatOpenAI(**{"max_retries":0, **settings}, cache=cache, callbacks=callbacks)
+
+class Registry:
+    """Routes per step and one client per distinct route, shared by every run in the process.
+
+    `factory(route, callbacks)` builds the chat model of a route; the default builds a
+    ChatOpenAI with the LLM response cache.
+    """
+
+    def __init__(self, routes:dict=None, factory=None):
+        self.routes = env_routes() if routes is None else routes
+        self.factory = factory
+        self.clients = {}
+        self.usage = defaultdict(lambda: {"calls":0, "input_tokens":0, "output_tokens":0})
+        self._lock = threading.Lock()
+        self._cache = None
+
+    def route(self, name:str) -> dict:
+        overrides = run_routes()
+        return {
+            **DEFAULT_ROUTE,
+            **self.routes.get("default", {}),
+            **overrides.get("default", {}),
+            **self.routes.get(name, {}),
+            **overrides.get(name, {}),
+        }
+
+    def build(self, route:dict):
+        callbacks = [instrumentation.usage_handler, ModelUsage(self.usage, route["model"])]
+        if self.factory:
+            return self.factory(route, callbacks)
+        # Only deterministic calls are cached; a sampled route would keep returning one sample
+        if route.get("temperature", 0) != 0:
+            return chat_openai(route, callbacks)
+        if self._cache is None:
+            import llm_cache
+            self._cache = llm_cache.from_env() or False
+        return chat_openai(route, callbacks, self._cache or None)
+
+    def client(self, name:str):
+        route = self.route(name)
+        key = json.dumps(route, sort_keys=True)
+        with self._lock:
+            if key not in self.clients:
+                client = self.build(route)
+                fallback = self.fallback_route(name)
+                if fallback:
+                    hedging.get().set_fallback(client, self.build(fallback))
+                self.clients[key] = client
+            return self.clients[key]
+
+    def fallback_route(self, name:str) -> dict:
+        # Only the output settings of the route are carried over, not its endpoint and key:
+        # a local route's hedges must not send the fallback model to the local server
+        route = self.route(name)
+        fallback = route.get("fallback")
+        if not fallback:
+            return None
+        if isinstance(fallback, str):
+            fallback = {"model":fallback}
+        default = {option:value for option, value in self.route("default").items() if option not in ROUTE_OPTIONS}
+        output = {option:route[option] for option in OUTPUT_OPTIONS if option in route}
+        return {**default, **output, **fallback}
+
+    def provider(self, name:str) -> str:
+        return provider(self.route(name))
+
+    def fallback_provider(self, name:str) -> str:
+        return provider(self.fallback_route(name) or self.route(name))
+
+    def costs(self) -> dict:
+        prices = {}
+        for route in [self.route(name) for name in ROUTES] + [json.loads(key) for key in self.clients]:
+            prices.setdefault(route["model"], price(route))
+        costs = {}
+        for model, row in self.usage.items():
+            input_price, output_price = prices.get(model, PRICES.get(model, (0.0, 0.0)))
+            costs[model] = {**row, "usd":round((row["input_tokens"] * input_price + row["output_tokens"] * output_price) / 1e6, 6)}
+        return costs
+
+registry = None
+_lock = threading.Lock()
+
+def get() -> Registry:
+    global registry
+    with _lock:
+        if registry is None:
+            registry = Registry()
+        return registry
+
+def reset(new:Registry=None):
+    global registry
+    with _lock:
+        registry = new
@@ -0,0 +1,48 @@
+# Measures what the latest interview turn added, so interviews can stop once turns
+# only repeat earlier sources and answers.
+#
+# A turn's gain is the mean of two fractions: the sources it retrieved that no earlier
+# turn retrieved, and the word 3-shingles of its answer that no earlier answer contained.
+import re
+
+from langchain_core.messages import AIMessage
+
+DEFAULT_THRESHOLD = 0.0 # 0 never stops early; 0.3 is a reasonable start
+MIN_TURNS = 2
+
+def shingles(text:str, n:int=3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def source_gain(documents:list, turn:int) -> float:
+    current = {doc["id"] for doc in documents if doc["turn"] == turn}
+    if not current:
+        return 0.0
+    earlier = {doc["id"] for doc in documents if doc["turn"] < turn}
+    return len(current - earlier) / len(current)
+
+def content_gain(answers:list) -> float:
+    latest = shingles(str(answers[-1].content))
+    if not latest:
+        return 0.0
+    earlier = set()
+    for answer in answers[:-1]:
+        earlier |= shingles(str(answer.content))
+    return len(latest - earlier) / len(latest)
+
+def turn_gain(state:dict, name:str="customer") -> float:
+    answers = [m for m in state["messages"] if isinstance(m, AIMessage) and m.name == name]
+    if not answers:
+        return 1.0
+    # Searches of a turn are labeled with the number of answers given before it
+    turn = len(answers) - 1
+    return (source_gain(state.get("context", []), turn) + content_gain(answers)) / 2
+
+def should_stop(state:dict, name:str="customer") -> bool:
+    threshold = state.get("novelty_threshold", DEFAULT_THRESHOLD)
+    if not threshold:
+        return False
+    answers = len([m for m in state["messages"] if isinstance(m, AIMessage) and m.name == name])
+    return answers >= MIN_TURNS and turn_gain(state, name) < threshold
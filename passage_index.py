@@ -0,0 +1,76 @@
+import re
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text:str) -> list:
+    return TOKEN_RE.findall(text.lower())
+
+def chunk(text:str, max_words:int=120) -> list:
+    # Merge short paragraphs and split long ones so passages are roughly max_words long
+    passages, current = [], []
+    for paragraph in re.split(r"\n\s*\n|\n(?==+ )", text):
+        words = paragraph.split()
+        while len(words) > max_words:
+            if current:
+                passages.append(" ".join(current))
+                current = []
+            passages.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        if current and len(current) + len(words) > max_words:
+            passages.append(" ".join(current))
+            current = []
+        current.extend(words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+class PassageIndex:
+    """BM25 over passages of the retrieved documents, held as a sparse (row, column, weight) term matrix.
+
+    Each passage is a copy of its document record with `content` replaced by
+    the passage text, so it keeps its source tag.
+    """
+
+    def __init__(self, passages:list, k1:float=1.5, b:float=0.75):
+        self.passages = passages
+        self.vocabulary = {}
+        rows, cols = [], []
+        for row, passage in enumerate(passages):
+            for term in tokenize(passage["content"]):
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+
+        n_passages, n_terms = len(passages), max(len(self.vocabulary), 1)
+        pairs, tf = np.unique(np.array(rows, dtype=np.int64) * n_terms + np.array(cols, dtype=np.int64), return_counts=True)
+        self.rows = pairs // n_terms
+        self.cols = pairs % n_terms
+
+        lengths = np.bincount(np.array(rows, dtype=np.int64), minlength=n_passages)
+        avg_length = max(lengths.mean(), 1.0) if n_passages else 1.0
+        df = np.bincount(self.cols, minlength=n_terms)
+        idf = np.log(1 + (n_passages - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[self.rows] / avg_length)
+        self.weights = idf[self.cols] * tf * (k1 + 1) / (tf + norm)
+
+    @classmethod
+    def from_documents(cls, documents:list, max_words:int=120, **kwargs):
+        passages = [
+            {**doc, "content":passage}
+            for doc in documents
+            for passage in chunk(doc["content"], max_words)
+        ]
+        return cls(passages, **kwargs)
+
+    def scores(self, query:str) -> np.ndarray:
+        terms = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        mask = np.isin(self.cols, terms)
+        return np.bincount(self.rows[mask], weights=self.weights[mask], minlength=len(self.passages))
+
+    def search(self, query:str, k:int) -> list:
+        if not self.passages:
+            return []
+        scores = self.scores(query)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [self.passages[i] for i in top]
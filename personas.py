@@ -0,0 +1,37 @@
+# Helpers for generating many customer personas in parallel shards.
+#
+# Shards are given distinct themes and their personas are merged with a local
+# near-duplicate check: personas are compared by the Jaccard similarity of the word
+# 3-shingles of their occupation and description, and by name.
+import novelty
+
+DUPLICATE_THRESHOLD = 0.5
+
+def shard_sizes(total:int, shard_size:int) -> list:
+    # Split `total` into the fewest shards of at most `shard_size`, as even as possible
+    shards = -(-total // shard_size)
+    return [total // shards + (1 if i < total % shards else 0) for i in range(shards)]
+
+def fingerprint(customer) -> set:
+    return novelty.shingles(f"{customer.occupation} {customer.description}")
+
+def jaccard(a:set, b:set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def dedupe(customers:list, existing:list=(), threshold:float=DUPLICATE_THRESHOLD) -> list:
+    """Return the customers that are not near-duplicates of `existing` or of an earlier customer."""
+    kept = []
+    seen = [(customer.name.lower().strip(), fingerprint(customer)) for customer in existing]
+    for customer in customers:
+        name, shingles = customer.name.lower().strip(), fingerprint(customer)
+        if any(name == other_name or jaccard(shingles, other) >= threshold for other_name, other in seen):
+            continue
+        kept.append(customer)
+        seen.append((name, shingles))
+    return kept
+
+def summary(customers:list) -> str:
+    # One line per persona, for telling a shard which personas already exist
+    return "\n".join(f"- {customer.name}, {customer.occupation}" for customer in customers)
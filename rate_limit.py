@@ -0,0 +1,219 @@
+# Process-wide rate limiting and retries for calls to OpenAI, Tavily and Wikipedia.
+#
+# Each provider has a request bucket and a token bucket (requests and tokens per minute),
+# an adaptive cap on calls in flight that halves when the provider throttles and grows
+# back by one after a run of successes, and retries with jittered exponential backoff
+# that waits at least as long as the provider's Retry-After.
+import asyncio
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+import weakref
+
+import instrumentation
+
+PROVIDERS = ("openai", "tavily", "wikipedia")
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_MAX_CONCURRENCY = 16
+# Completion tokens counted against the token bucket before the real size is known
+DEFAULT_COMPLETION_TOKENS = 500
+
+class TokenBucket:
+    """Allows `per_minute` units per minute with bursts of up to `burst` units.
+
+    Callers reserve units up front; when the bucket is empty the reservation
+    puts it in debt and the caller sleeps until the debt is paid back.
+    """
+
+    def __init__(self, per_minute:float, burst:float=None):
+        self.rate = per_minute / 60
+        self.capacity = burst or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount:float) -> float:
+        # Take `amount` units and return the seconds to wait before using them
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(-self.tokens / self.rate, 0.0)
+
+    def pause(self, seconds:float):
+        # Nobody gets units for `seconds`, e.g. while a Retry-After is pending. Refill up to
+        # now first, so the time the failed request was in flight doesn't pay off the debt
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    async def acquire(self, amount:float=1):
+        wait = self.reserve(amount)
+        if wait:
+            await asyncio.sleep(wait)
+
+class AdaptiveLimit:
+    """Cap on calls in flight that halves on throttling and grows by one after `limit` successes."""
+
+    def __init__(self, max_limit:int):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.inflight = 0
+        self.successes = 0
+        self._conditions = weakref.WeakKeyDictionary()
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if loop not in self._conditions:
+            self._conditions[loop] = asyncio.Condition()
+        return self._conditions[loop]
+
+    async def __aenter__(self):
+        condition = self._condition()
+        async with condition:
+            await condition.wait_for(lambda: self.inflight < self.limit)
+            self.inflight += 1
+
+    async def __aexit__(self, *exc):
+        condition = self._condition()
+        async with condition:
+            self.inflight -= 1
+            condition.notify_all()
+
+    def throttled(self):
+        self.limit = max(self.limit // 2, 1)
+        self.successes = 0
+
+    def succeeded(self):
+        self.successes += 1
+        if self.successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self.successes = 0
+
+class ProviderError(Exception):
+    """Failed response of a client whose own exceptions carry no status code (e.g. Tavily's)."""
+
+    def __init__(self, message:str, status_code:int=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @classmethod
+    def from_error(cls, error:Exception) -> "ProviderError":
+        # Clients that raise Exception("Error 429: Too Many Requests")
+        match = re.match(r"Error (\d{3})\b", str(error))
+        return cls(str(error), int(match.group(1)) if match else None)
+
+def status_code(error:Exception):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def retry_after(error:Exception):
+    # Seconds from the Retry-After (or OpenAI's retry-after-ms) header of a failed response
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        date = email.utils.parsedate_to_datetime(value)
+        return max(date.timestamp() - time.time(), 0.0) if date else None
+
+def is_retryable(error:Exception) -> bool:
+    if status_code(error) in RETRY_STATUSES:
+        return True
+    # Connection failures and timeouts of openai/httpx/requests/aiohttp clients
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "ClientConnectorError", "ClientOSError", "ServerDisconnectedError")
+
+class Provider:
+    def __init__(self, name:str, requests_per_minute:float=0, tokens_per_minute:float=0, max_concurrency:int=DEFAULT_MAX_CONCURRENCY,
+                 max_retries:int=DEFAULT_MAX_RETRIES, base_delay:float=1.0, max_delay:float=60.0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.limit = AdaptiveLimit(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+        self.retries = 0
+
+    def backoff(self, attempt:int, error:Exception) -> float:
+        delay = min(self.base_delay * 2 ** attempt, self.max_delay)
+        delay = random.uniform(delay / 2, delay)
+        return max(delay, retry_after(error) or 0.0)
+
+    async def call(self, afunc, tokens:int=0):
+        """Await `afunc()` within the provider's limits, retrying throttled and transient failures."""
+        for attempt in range(self.max_retries + 1):
+            if self.requests:
+                await self.requests.acquire(1)
+            if self.tokens and tokens:
+                await self.tokens.acquire(tokens)
+            try:
+                async with self.limit:
+                    result = await afunc()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff(attempt, e)
+                if status_code(e) == 429:
+                    self.throttled += 1
+                    self.limit.throttled()
+                    # Hold every caller back until the provider accepts requests again
+                    for bucket in (self.requests, self.tokens):
+                        if bucket:
+                            bucket.pause(delay)
+                self.retries += 1
+                instrumentation.record_retry()
+                await asyncio.sleep(delay)
+            else:
+                self.limit.succeeded()
+                return result
+
+    def stats(self) -> dict:
+        return {"throttled":self.throttled, "retries":self.retries, "concurrency_limit":self.limit.limit}
+
+providers = {}
+_lock = threading.Lock()
+
+def from_env(name:str) -> Provider:
+    # e.g. RATE_LIMIT_OPENAI_RPM=500 RATE_LIMIT_OPENAI_TPM=30000; unset buckets don't limit
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    return Provider(
+        name,
+        requests_per_minute=float(os.environ.get(f"{prefix}_RPM", 0)),
+        tokens_per_minute=float(os.environ.get(f"{prefix}_TPM", 0)),
+        max_concurrency=int(os.environ.get(f"{prefix}_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        max_retries=int(os.environ.get("RATE_LIMIT_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+    )
+
+def get(name:str) -> Provider:
+    with _lock:
+        if name not in providers:
+            providers[name] = from_env(name)
+        return providers[name]
+
+def reset():
+    with _lock:
+        providers.clear()
+
+def estimate_tokens(input) -> int:
+    # Prompt tokens of a message list plus an allowance for the completion
+    import context_builder
+    messages = input if isinstance(input, list) else [input]
+    return sum(context_builder.count_tokens(str(getattr(m, "content", m))) for m in messages) + DEFAULT_COMPLETION_TOKENS
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+# Seconds a cached result stays fresh, per search backend
+DEFAULT_TTLS = {
+    "tavily": 6 * 60 * 60,
+    "wikipedia": 7 * 24 * 60 * 60,
+}
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def normalize_query(query:str) -> str:
+    # Case, whitespace and punctuation rarely change what a search returns; word order can
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+def cacheable(value) -> bool:
+    # Only lists of result records are cached, never an error message a client returned instead
+    return isinstance(value, list) and all(isinstance(item, dict) for item in value)
+
+class RetrievalCache:
+    """On-disk cache for search results, keyed by backend, normalized query and backend parameters.
+
+    Entries expire after the backend's TTL and the least recently used ones are
+    evicted once the stored results exceed `max_bytes`.
+    """
+
+    def __init__(self, path:str=".cache/retrieval.sqlite", ttls:dict=None, max_bytes:int=DEFAULT_MAX_BYTES):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                backend TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(backend:str, query:str, params:dict=None) -> str:
+        payload = json.dumps([backend, normalize_query(query), params or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, backend:str, query:str, params:dict=None):
+        key = self.key(backend, query, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses[backend] += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttls.get(backend, 0):
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses[backend] += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[backend] += 1
+        return json.loads(value)
+
+    def set(self, backend:str, query:str, value, params:dict=None):
+        if not cacheable(value):
+            return
+        key = self.key(backend, query, params)
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, backend, data, len(data.encode()), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def fetch(self, backend:str, query:str, load, params:dict=None):
+        # Return the cached result, or call `load()` and cache what it returns
+        value = self.get(backend, query, params)
+        if value is None:
+            value = load()
+            self.set(backend, query, value, params)
+        return value
+
+    async def afetch(self, backend:str, query:str, aload, params:dict=None):
+        value = self.get(backend, query, params)
+        if value is None:
+            value = await aload()
+            self.set(backend, query, value, params)
+        return value
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def stats(self) -> dict:
+        return {
+            backend: {"hits": self.hits[backend], "misses": self.misses[backend]}
+            for backend in sorted(set(self.hits) | set(self.misses))
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+def from_env() -> RetrievalCache:
+    # RETRIEVAL_CACHE_PATH=:memory: keeps the cache for the current process only
+    ttls = {
+        backend: float(os.environ[f"RETRIEVAL_CACHE_TTL_{backend.upper()}"])
+        for backend in DEFAULT_TTLS
+        if f"RETRIEVAL_CACHE_TTL_{backend.upper()}" in os.environ
+    }
+    return RetrievalCache(
+        path=os.environ.get("RETRIEVAL_CACHE_PATH", ".cache/retrieval.sqlite"),
+        ttls=ttls,
+        max_bytes=int(os.environ.get("RETRIEVAL_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    )
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from shared import PROMPT_VERSION
+
+DEFAULT_TTL = 24 * 60 * 60
+
+class SectionStore:
+    """On-disk store of finished interview sections.
+
+    Sections are keyed by a hash of the customer, the topic, the interview settings, the
+    model routes that write them and PROMPT_VERSION, so editing a persona, changing a
+    setting or a model, or bumping the prompt version interviews the customer again. Entries older than `ttl` seconds are stale.
+    """
+
+    def __init__(self, path:str=".cache/sections.sqlite", ttl:float=DEFAULT_TTL):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sections (
+                key TEXT PRIMARY KEY,
+                section TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(customer, topic:str, settings:dict=None, routes:dict=None) -> str:
+        payload = json.dumps([PROMPT_VERSION, customer.model_dump(), " ".join(topic.split()), settings or {}, routes or {}], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, customer, topic:str, settings:dict=None, routes:dict=None) -> dict:
+        key = self.key(customer, topic, settings, routes)
+        with self._lock:
+            row = self._conn.execute("SELECT section, created_at FROM sections WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, customer, topic:str, section:dict, settings:dict=None, routes:dict=None):
+        key = self.key(customer, topic, settings, routes)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sections VALUES (?, ?, ?)", (key, json.dumps(section), time.time()))
+            # Stale sections would only be replaced, never read again
+            self._conn.execute("DELETE FROM sections WHERE created_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM sections")
+            self._conn.commit()
+
+def from_env() -> SectionStore:
+    # SECTION_STORE_TTL=0 interviews every customer on every run
+    return SectionStore(
+        path=os.environ.get("SECTION_STORE_PATH", ".cache/sections.sqlite"),
+        ttl=float(os.environ.get("SECTION_STORE_TTL", DEFAULT_TTL)),
+    )
@@ -0,0 +1,307 @@
+# Local HTTP service around finalize.graph, for many review sessions in one process.
+#
+#   python server.py --port 8000
+#
+# Endpoints (JSON in, JSON out):
+#   POST /runs                 {"topic": ..., "max_customers": 3, "deadline": 600, "models": {...}}
+#                              starts a session; other keys are graph input, "deadline" is seconds
+#                              for the interviews and "models" maps routes to model names (see models)
+#   GET  /runs                 every session and its status
+#   GET  /runs/<id>            status, customers, dropped customers and the final report
+#   POST /runs/<id>/approve    approve the customers; the interviews and the report run
+#   POST /runs/<id>/revise     {"feedback": "2: make them a student"} regenerates the customers
+#   GET  /runs/<id>/events     Server-Sent Events: status, node, token, report and error
+#   GET  /metrics              Prometheus metrics of every run in the process
+#
+# A session's status is generating, awaiting_feedback, running, done or failed. Sessions share
+# the compiled graph, the clients, the caches and the rate limits, and the events of a session
+# are kept so a client that connects late (or reconnects with Last-Event-ID) gets all of them.
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import finalize
+import instrumentation
+import models
+
+# Nodes whose LLM output is streamed as token events
+streamed_nodes = {"answer_question", "write_section", "write_report"}
+# Sessions idle (finished, or waiting for feedback) for longer than this are forgotten
+DEFAULT_SESSION_TTL = 3600
+MAX_BODY_BYTES = 1024 * 1024
+HEARTBEAT_SECONDS = 15
+
+class HTTPError(Exception):
+    def __init__(self, status:int, message:str):
+        super().__init__(message)
+        self.status = status
+
+class Session:
+    def __init__(self, graph_input:dict, deadline:float=None, models:dict=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.config = {"configurable":{"thread_id":f"server-{self.id}"}}
+        if models:
+            self.config["configurable"]["models"] = models
+        self.graph_input = graph_input
+        self.deadline = deadline
+        self.status = "generating"
+        self.customers = []
+        self.dropped = []
+        self.final_report = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.events = []
+        self.changed = asyncio.Condition()
+        self.task = None
+
+    async def emit(self, event:str, data:dict):
+        async with self.changed:
+            self.events.append((event, data))
+            self.updated_at = time.time()
+            self.changed.notify_all()
+
+    async def set_status(self, status:str):
+        self.status = status
+        await self.emit("status", {"status":status})
+
+    def start(self, graph_input, config:dict):
+        self.task = asyncio.create_task(self.run(graph_input, config))
+
+    async def run(self, graph_input, config:dict):
+        graph = finalize.graph
+        try:
+            async for namespace, mode, event in graph.astream(graph_input, config, stream_mode=["updates", "messages"], subgraphs=True):
+                if mode == "messages":
+                    chunk, metadata = event
+                    node = metadata.get("langgraph_node")
+                    if node in streamed_nodes and chunk.content:
+                        await self.emit("token", {"node":node, "customer":metadata.get("customer"), "content":chunk.content})
+                    continue
+                for node, update in event.items():
+                    if node.startswith("__"):
+                        continue
+                    await self.emit("node", {"node":node, "graph":"/".join(part.split(":")[0] for part in namespace)})
+                    if not namespace and node == "finalize_report":
+                        self.final_report = update["final_report"]
+                        await self.emit("report", {"final_report":self.final_report})
+            state = await graph.aget_state(self.config)
+            self.customers = [customer.model_dump() for customer in state.values.get("customers", [])]
+            self.dropped = state.values.get("dropped", [])
+            await self.set_status("awaiting_feedback" if "human_feedback" in state.next else "done")
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            await self.emit("error", {"error":self.error})
+            await self.set_status("failed")
+
+    # The status changes before the first await, so a second approve or revise gets a 409; it
+    # is put back if the update fails, so the session can still be approved or revised
+    async def revise(self, feedback:str):
+        self.status = "generating"
+        try:
+            await finalize.graph.aupdate_state(self.config, {"human_analyst_feedback":feedback}, as_node="human_feedback")
+        except Exception:
+            self.status = "awaiting_feedback"
+            raise
+        await self.set_status("generating")
+        self.start(None, self.config)
+
+    async def approve(self):
+        self.status = "running"
+        try:
+            await finalize.graph.aupdate_state(self.config, {"human_analyst_feedback":None}, as_node="human_feedback")
+            config = self.config
+            # Interviews still running at the deadline are left out of the report
+            if self.deadline:
+                config = {"configurable":{**config["configurable"], "deadline":time.time() + self.deadline}}
+        except Exception:
+            self.status = "awaiting_feedback"
+            raise
+        await self.set_status("running")
+        self.start(None, config)
+
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def summary(self) -> dict:
+        return {"id":self.id, "topic":self.graph_input.get("topic"), "status":self.status, "created_at":self.created_at, "updated_at":self.updated_at}
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "customers":self.customers, "dropped":self.dropped, "final_report":self.final_report, "error":self.error}
+
+def model_overrides(value) -> dict:
+    # Clients may only pick model names per route. Endpoints, keys and other settings stay
+    # server-side, so a request can't send the server's API key to a host of its choosing
+    if not value:
+        return None
+    if not isinstance(value, dict):
+        raise HTTPError(400, "models must map routes to model names")
+    overrides = {}
+    for route, model in value.items():
+        if route != "default" and route not in models.ROUTES:
+            raise HTTPError(400, f"unknown model route {route}")
+        if not isinstance(model, str) or not model.strip():
+            raise HTTPError(400, f"models.{route} must be a model name")
+        overrides[route] = {"model":model}
+    return overrides
+
+class Server:
+    def __init__(self, session_ttl:float=DEFAULT_SESSION_TTL):
+        self.sessions = {}
+        self.session_ttl = session_ttl
+
+    async def prune(self):
+        # Forgotten sessions take their checkpoints with them
+        now = time.time()
+        for id, session in list(self.sessions.items()):
+            if (session.finished() or session.status == "awaiting_feedback") and now - session.updated_at > self.session_ttl:
+                del self.sessions[id]
+                await finalize.graph.checkpointer.adelete_thread(session.config["configurable"]["thread_id"])
+
+    def session(self, id:str) -> Session:
+        if id not in self.sessions:
+            raise HTTPError(404, f"no session {id}")
+        return self.sessions[id]
+
+    def awaiting_feedback(self, id:str) -> Session:
+        session = self.session(id)
+        if session.status != "awaiting_feedback":
+            raise HTTPError(409, f"session {id} is {session.status}, not awaiting_feedback")
+        return session
+
+    async def create(self, body:dict) -> Session:
+        if not isinstance(body.get("topic"), str) or not body["topic"].strip():
+            raise HTTPError(400, "topic is required")
+        deadline = body.get("deadline")
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or deadline <= 0):
+            raise HTTPError(400, "deadline must be a positive number of seconds")
+        await self.prune()
+        graph_input = {key:value for key, value in body.items() if key not in ("deadline", "models")}
+        graph_input.setdefault("max_customers", 3)
+        session = Session(graph_input, deadline, model_overrides(body.get("models")))
+        self.sessions[session.id] = session
+        await session.emit("status", {"status":session.status})
+        session.start(graph_input, session.config)
+        return session
+
+    async def route(self, method:str, path:str, body:dict, headers:dict, writer):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["runs"] and method == "POST":
+            return 201, (await self.create(body)).to_dict()
+        if parts == ["runs"] and method == "GET":
+            return 200, {"runs":[session.summary() for session in self.sessions.values()]}
+        if len(parts) == 2 and parts[0] == "runs" and method == "GET":
+            return 200, self.session(parts[1]).to_dict()
+        if len(parts) == 3 and parts[0] == "runs":
+            if parts[2] == "events" and method == "GET":
+                await self.stream(self.session(parts[1]), headers, writer)
+                return None
+            if parts[2] == "approve" and method == "POST":
+                session = self.awaiting_feedback(parts[1])
+                await session.approve()
+                return 202, session.to_dict()
+            if parts[2] == "revise" and method == "POST":
+                feedback = body.get("feedback")
+                if not isinstance(feedback, str) or not feedback.strip():
+                    raise HTTPError(400, "feedback is required")
+                session = self.awaiting_feedback(parts[1])
+                await session.revise(feedback)
+                return 202, session.to_dict()
+        if parts == ["metrics"] and method == "GET":
+            return 200, instrumentation.prometheus_text()
+        if parts == ["health"] and method == "GET":
+            return 200, {"sessions":len(self.sessions)}
+        raise HTTPError(404, f"no route for {method} {path}")
+
+    async def stream(self, session:Session, headers:dict, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        try:
+            position = int(headers.get("last-event-id", -1)) + 1
+        except ValueError:
+            position = 0
+        while True:
+            async with session.changed:
+                if position >= len(session.events):
+                    if session.finished():
+                        break
+                    try:
+                        await asyncio.wait_for(session.changed.wait(), HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        writer.write(b": keep-alive\n\n")
+                events = session.events[position:]
+            for event, data in events:
+                writer.write(f"id: {position}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode())
+                position += 1
+            await writer.drain()
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+            try:
+                method, target, _ = request_line.split(" ", 2)
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    raise HTTPError(413, "request body too large")
+                raw = await reader.readexactly(length) if length else b""
+                body = json.loads(raw) if raw else {}
+                if not isinstance(body, dict):
+                    raise HTTPError(400, "body must be a JSON object")
+                result = await self.route(method, urlsplit(target).path, body, headers, writer)
+            except HTTPError as e:
+                result = e.status, {"error":str(e)}
+            except (ValueError, json.JSONDecodeError) as e:
+                result = 400, {"error":f"bad request: {e}"}
+            except (ConnectionError, asyncio.IncompleteReadError):
+                raise
+            except Exception as e:
+                # The client gets an answer rather than a closed socket
+                result = 500, {"error":f"{type(e).__name__}: {e}"}
+            if result is not None:
+                status, payload = result
+                send(writer, status, payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+REASONS = {200:"OK", 201:"Created", 202:"Accepted", 400:"Bad Request", 404:"Not Found", 409:"Conflict", 413:"Payload Too Large", 500:"Internal Server Error"}
+
+def send(writer, status:int, payload):
+    if isinstance(payload, str):
+        data, content_type = payload.encode(), "text/plain; version=0.0.4"
+    else:
+        data, content_type = json.dumps(payload).encode(), "application/json"
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data
+    )
+
+async def serve(host:str, port:int):
+    # Compile the graph (and open the checkpointer) once, before the first request
+    finalize.graph
+    server = Server(float(os.environ.get("SERVER_SESSION_TTL", DEFAULT_SESSION_TTL)))
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"listening on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve content creator runs over HTTP with Server-Sent Events.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,242 @@
+# Customer models, graph state and prompt templates shared by the graphs in this project.
+# Kept free of clients and heavy imports so it can be imported anywhere.
+import operator
+from typing import List, Annotated
+from typing_extensions import TypedDict
+from pydantic import BaseModel, Field
+from langchain_core.messages import SystemMessage
+from langgraph.graph import MessagesState
+
+class Customer(BaseModel):
+    name:str=Field(
+        description="Name of the customer"
+    )
+
+    occupation: str = Field(
+        description="Occupration of the customer"
+    )
+
+    age: int = Field(
+        description="customer's age"
+    )
+
+    description: str = Field(
+        description="Description of the customer focus, concerns, and motives.",
+    )
+    @property
+    def persona(self)-> str:
+        return f"Name: {self.name}\nOccupation:{self.occupation}\nAge:{self.age}\nDescription: {self.description}\n"
+
+class Perspective(BaseModel):
+    customers: List[Customer] = Field(
+        description="Comprehensive list of customers with their occupation and age"
+    )
+
+class Themes(BaseModel):
+    themes: List[str] = Field(
+        description="Distinct themes, one short phrase each"
+    )
+
+class GenerateCustomersState(TypedDict):
+    topic: str #Research product
+    max_customers: int # Number of customer
+    persona_shard_size: int # Personas per generation call when max_customers is larger
+    human_analyst_feedback: str # Human feedback
+    customers: List[Customer] # Customers writing review
+
+class InterviewState(MessagesState):
+    topic: str
+    max_num_turns:int 
+    memory_strategy: str # "full" or "summary", see conversation_memory
+    memory_token_threshold: int
+    memory_keep_exchanges: int
+    novelty_threshold: float # Stop once a turn adds less than this, see novelty
+    summary: str # Running summary of the folded turns
+    summarized: int # Number of leading messages folded into the summary
+    context: Annotated[List[dict], operator.add] # Retrieved documents, see context_builder
+    context_token_budget:int
+    passage_top_k:int
+    customer: Customer
+    interview:str
+    sections:list
+    search_query:str
+    degraded: Annotated[bool, operator.or_] # A search timed out, so the section is not cached
+
+# Only the section goes back to the parent graph; settings forwarded by Send must not be written back by every interview
+class InterviewOutputState(TypedDict):
+    sections:list
+
+class SearchQuery(BaseModel):
+    search_query:str = Field(None, description="Search query for retrieval.")
+
+class ResearchGraphState(TypedDict):
+    topic:str
+    max_customers:int
+    human_analyst_feedback:str
+    customers:List[Customer]
+    persona_shard_size:int
+    max_num_turns:int
+    context_token_budget:int
+    passage_top_k:int
+    memory_strategy:str
+    memory_token_threshold:int
+    memory_keep_exchanges:int
+    novelty_threshold:float
+    report_fan_in:int # Sections or partial reports merged per LLM call
+    prefetch_background:bool # Search the topic once before the interviews (default True)
+    background: List[dict] # Documents from those searches, see context_builder
+    sections: Annotated[list, operator.add]
+    partials: Annotated[list, operator.add] # Partial reports of customer groups
+    dropped: Annotated[list, operator.add] # Customers whose interview missed the run deadline
+    content:str
+    sources: list # Records of the sources the report can cite, see citations
+    final_report: str
+
+class ReportGroupState(TypedDict):
+    topic:str
+    customers:List[Customer]
+    background:List[dict]
+    max_num_turns:int
+    context_token_budget:int
+    passage_top_k:int
+    memory_strategy:str
+    memory_token_threshold:int
+    memory_keep_exchanges:int
+    novelty_threshold:float
+    sections: Annotated[list, operator.add]
+    partials: Annotated[list, operator.add]
+    dropped: Annotated[list, operator.add]
+
+class ReportGroupOutputState(TypedDict):
+    partials: Annotated[list, operator.add]
+    dropped: Annotated[list, operator.add]
+
+# Part of the key of stored interview sections (see section_store); bump it when a prompt
+# that shapes the interview or the section changes, so stored sections are written again
+PROMPT_VERSION = 2
+
+customer_instructions = """You are tasked with creating a set of AI customer personas. Follow these instructions carefully
+1. First, review the product topic: {topic}
+
+2. Examine any editoral feedback that has been optionally provided to guide creation of the analysts: {human_analyst_feedback}
+
+3. Determin the most interesting themes based upon documents and/or feedback above.
+
+4. Pick the top {max_customers} themes.
+
+5. Assign one analyst to each theme."""
+
+theme_instructions = """You are planning a set of AI customer personas for the product topic: {topic}
+
+Examine any editoral feedback that has been optionally provided to guide creation of the analysts: {human_analyst_feedback}
+
+List {num_themes} distinct themes, such as kinds of buyers, uses or concerns, that together cover the most interesting angles on the topic."""
+
+customer_shard_instructions = """You are tasked with creating a set of AI customer personas. Follow these instructions carefully
+1. First, review the product topic: {topic}
+
+2. Examine any editoral feedback that has been optionally provided to guide creation of the analysts: {human_analyst_feedback}
+
+3. Create {count} customer personas for this theme: {theme}
+Other themes are covered separately, so stay within yours: {other_themes}
+
+4. Make every persona distinct in name, occupation and concerns, including from these existing personas:
+{existing}"""
+
+revise_customer_instructions = """You are revising one AI customer persona in a set created for the product topic: {topic}
+
+Here is the persona to revise:
+{customer}
+
+Apply this editorial feedback to it: {feedback}
+
+Keep anything the feedback does not ask to change. The other personas in the set are listed below; keep the revised persona distinct from them.
+{other_customers}"""
+
+question_instructions="""You are an analyst tasked with interviewing an customer to learn about a specific topic.
+Your goal is boil down to interesting and specific insights related to your topic.
+1. Interesting: Insights that people will find surprising or non-obvious
+2. Specific: Insights the avoid generalities and include specific examples from the customer.
+Here is your topic of focus and set of goals: {goals}
+Begin by introding yourself using a name that fits your persona, and then ask your question.
+Continue to ask questions to drill down and refine your understanding of the topic.
+When you are satisfied with your understanding, complete the interview with "Thank you so much for your help!
+Remember to stay in character throughout your response, reflecting the persona and goals prvided to you.
+"""
+
+#Search query writing
+search_instructions = SystemMessage(content=f""" You will be given a conversation between an analyst and a customer.
+Your goal is to generate a well-structured query for use in retrieval and / or web-search related to the conversation.
+First, analyze the full converstion.
+Pay particular attention to the final question posed by the analyst.
+Convert this final question into a well-structured web search query""")
+
+#Generate answer
+answer_instructions = """You are a customer being interviewed by an analyst.
+Here is analyst area of focus:{goals}.
+Your goal is to answer a question posed by the interviewer.
+To answer question, use this context: {context}
+When answering questions, follow these guidelines:
+1. Use only the information provided in the context.
+2. Do not introduce external information or make assumptions beyond what is explicitly stated in the context.
+3. Each document in the context has an id, for example <Document id="S1a2b3c" .../>.
+4. Cite the id in brackets next to any statement that uses the document, for example [S1a2b3c].
+5. Do not add a list of sources.
+"""
+
+summary_instructions = """You are keeping notes on an interview between an analyst and a customer.
+Here is the summary of the interview so far: {summary}
+Extend it with the new part of the conversation below. Keep every specific fact, example and opinion the customer gave,
+keep the citations (for example [S1a2b3c]) next to the statements they support, and drop greetings and repetition.
+Return only the updated summary."""
+
+#write review
+section_writer_instructions = """ 
+You are an expert technical writer.
+Your task is to create a short, easily digestible section of a report based on a set of source documents.
+1. Each source document starts with a <Document tag that carries its id, for example <Document id="S1a2b3c" .../>.
+2. Create a report structure using markdoen formatting:
+a. Title (## header)
+b. Summary (### header)
+3. Make your title engaging based upon the focus area of the analyst: 
+{focus}
+4. For the summary section:
+- Set up summary with general background / context related to the focus area of the analyst
+- Emphasize what is novel, interesting, or surprising about insights gathered from the interview
+- Do not mention the names of interviewers or experts
+- Aim for approximately 400 words maximum
+- Cite the id of the source document in brackets next to the information taken from it, for example [S1a2b3c]
+5. Do not add a list of sources; it is added from the ids you cite.
+6. Include no preamble before the title of the report.
+"""
+
+#writing final report
+report_writer_instructions = """You are a technical writer creating a report on this overall topic: 
+
+{topic}
+    
+You have a team of analysts. Each analyst has done two things: 
+
+1. They conducted an interview with an expert on a specific sub-topic.
+2. They write up their finding into a memo.
+
+Your task: 
+
+1. You will be given a collection of memos from your analysts.
+2. Think carefully about the insights from each memo.
+3. Consolidate these into a crisp overall summary that ties together the central ideas from all of the memos. 
+4. Summarize the central points in each memo into a cohesive single narrative.
+
+To format your report:
+ 
+1. Use markdown formatting. 
+2. Include no pre-amble for the report.
+3. Use no sub-heading. 
+4. Start your report with a single title header: ## Insights
+5. Do not mention any analyst names in your report.
+6. Preserve the citations in the memos exactly as written, for example [S1a2b3c], next to the statements they support.
+7. Do not add a list of sources; it is added from the citations.
+
+Here are the memos from your analysts to build your report from: 
+
+{context}"""
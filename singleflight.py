@@ -0,0 +1,51 @@
+import asyncio
+import weakref
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    While a call for a key is in flight, later callers for that key wait for
+    it and get the same result (or exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._inflight = weakref.WeakKeyDictionary()
+
+    def _futures(self) -> dict:
+        # Futures belong to one event loop, so keep the in-flight calls per loop
+        loop = asyncio.get_running_loop()
+        if loop not in self._inflight:
+            self._inflight[loop] = {}
+        return self._inflight[loop]
+
+    async def do(self, key, afunc):
+        futures = self._futures()
+        self.calls += 1
+        if key in futures:
+            self.shared += 1
+            # Shielded so a cancelled waiter does not cancel the call the others wait for
+            return await asyncio.shield(futures[key])
+        future = asyncio.get_running_loop().create_future()
+        futures[key] = future
+        try:
+            result = await afunc()
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. timed out); the others see a timeout rather than a cancellation
+            future.set_exception(asyncio.TimeoutError("shared call was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del futures[key]
+
+    def stats(self) -> dict:
+        return {"calls":self.calls, "shared":self.shared}
@@ -0,0 +1,70 @@
+# Time bounds for a run.
+#
+# The run deadline is an absolute time (time.time()) in the graph config,
+# {"configurable": {"deadline": ...}}; interviews still running at the deadline are
+# dropped. Every provider call attempt has its own timeout, and search nodes have a
+# budget after which the interview continues with the context that already arrived.
+# LLM nodes have a budget for all their calls, retries included; the report nodes, which
+# run once the interviews are done, may run a grace period past the deadline.
+import asyncio
+import functools
+import os
+import time
+
+from langgraph.config import get_config
+
+DEFAULT_CALL_TIMEOUTS = {
+    "openai": 120.0,
+    "local": 120.0,
+    "tavily": 20.0,
+    "wikipedia": 30.0,
+}
+DEFAULT_SEARCH_TIMEOUT = 45.0
+DEFAULT_NODE_TIMEOUT = 300.0
+DEFAULT_REPORT_GRACE = 120.0
+
+def deadline():
+    try:
+        return get_config()["configurable"].get("deadline")
+    except RuntimeError:
+        return None
+
+def remaining():
+    # Seconds left before the run deadline, or None without one
+    run_deadline = deadline()
+    if run_deadline is None:
+        return None
+    return max(run_deadline - time.time(), 0.0)
+
+def call_timeout(provider:str) -> float:
+    return float(os.environ.get(f"CALL_TIMEOUT_{provider.upper()}", DEFAULT_CALL_TIMEOUTS.get(provider, 60.0)))
+
+def search_timeout() -> float:
+    return float(os.environ.get("SEARCH_TIMEOUT", DEFAULT_SEARCH_TIMEOUT))
+
+def node_timeout(node:str) -> float:
+    # NODE_TIMEOUT_<NODE> overrides NODE_TIMEOUT for one node
+    return float(os.environ.get(f"NODE_TIMEOUT_{node.upper()}", os.environ.get("NODE_TIMEOUT", DEFAULT_NODE_TIMEOUT)))
+
+def report_grace() -> float:
+    return float(os.environ.get("REPORT_GRACE", DEFAULT_REPORT_GRACE))
+
+async def bounded(awaitable, seconds:float=None, grace:float=0.0):
+    # Await within `seconds` and the run deadline (plus `grace`); raises asyncio.TimeoutError
+    left = remaining()
+    limits = [limit for limit in (seconds, None if left is None else left + grace) if limit is not None]
+    if not limits:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, min(limits))
+
+def budget(node:str, report:bool=False):
+    """Bound an async graph node by its node timeout and the run deadline.
+
+    Report nodes get `report_grace()` seconds past the deadline to merge what finished.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(state):
+            return await bounded(func(state), node_timeout(node), report_grace() if report else 0.0)
+        return wrapper
+    return decorator